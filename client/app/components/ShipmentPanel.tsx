@@ -44,7 +44,7 @@ export default function ShipmentPanel({ shipments, selectedShipment, onSelect, o
 
     useEffect(() => {
         apiFetch(`${API_BASE}/routes/nodes`).then((r) => r.json()).then(setAvailableNodes).catch(() => { });
-        apiFetch(`${API_BASE}/auth/users/receivers`).then((r) => r.json()).then(setReceivers).catch(() => { });
+        apiFetch(`${API_BASE}/auth/users/receivers`).then((r) => r.json()).then((d) => setReceivers(d.items ?? d)).catch(() => { });
     }, []);
 
     const handleCreate = async () => {
@@ -36,6 +36,42 @@ contract ShipmentAnchor {
         uint256 _weightKg,
         bytes32 _documentHash
     ) external {
+        _append(_shipmentId, _locationCode, _weightKg, _documentHash);
+    }
+
+    /**
+     * @notice Append checkpoints for several shipments in one transaction.
+     * @dev Arrays are parallel; amortizes the 21k base gas across the
+     *      whole burst instead of paying it per checkpoint.
+     */
+    function appendCheckpointBatch(
+        string[] calldata _shipmentIds,
+        string[] calldata _locationCodes,
+        uint256[] calldata _weightsKg,
+        bytes32[] calldata _documentHashes
+    ) external {
+        require(
+            _shipmentIds.length == _locationCodes.length &&
+                _shipmentIds.length == _weightsKg.length &&
+                _shipmentIds.length == _documentHashes.length,
+            "Array length mismatch"
+        );
+        for (uint256 i = 0; i < _shipmentIds.length; i++) {
+            _append(
+                _shipmentIds[i],
+                _locationCodes[i],
+                _weightsKg[i],
+                _documentHashes[i]
+            );
+        }
+    }
+
+    function _append(
+        string calldata _shipmentId,
+        string calldata _locationCode,
+        uint256 _weightKg,
+        bytes32 _documentHash
+    ) private {
         ShipmentCheckpoint memory cp = ShipmentCheckpoint({
             shipmentId: _shipmentId,
             locationCode: _locationCode,
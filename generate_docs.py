@@ -4,96 +4,143 @@
 # ]
 # ///
 
-from docx import Document
-from docx.shared import Pt, Inches
+import io
 import os
+import zipfile
+from copy import deepcopy
 
-os.makedirs('sample_docs', exist_ok=True)
+from lxml import etree
 
-# 1. Purchase Order
-doc1 = Document()
-doc1.add_heading('PURCHASE ORDER', 0)
-doc1.add_paragraph('PO Number: PO-PHARMA-2026')
-doc1.add_paragraph('Date: October 24, 2026')
-doc1.add_paragraph('Buyer: Global Health Distributors\n123 MedSupply Way, New York, NY 10001')
-doc1.add_paragraph('Supplier: BioGen Pharmaceuticals\n456 Science Park, Boston, MA 02115')
-
-doc1.add_heading('Items Ordered', level=1)
-table = doc1.add_table(rows=1, cols=4)
-table.style = 'Table Grid'
-hdr_cells = table.rows[0].cells
-hdr_cells[0].text = 'Item'
-hdr_cells[1].text = 'Quantity'
-hdr_cells[2].text = 'Unit Price'
-hdr_cells[3].text = 'Total'
+from docx import Document
+from docx.opc import phys_pkg
+from docx.oxml.ns import nsmap, qn
+from docx.table import Table
 
-items = [
-    ('Insulin Glargine 100U/mL (Vials)', '5000', '$25.00', '$125,000.00'),
-    ('Amoxicillin 500mg (Bottles of 100)', '2000', '$12.00', '$24,000.00'),
-    ('Lisinopril 10mg (Bottles of 90)', '3000', '$8.50', '$25,500.00')
-]
+# python-docx hardwires zlib's default level (6). These docs are small,
+# repetitive XML, so level 1 gets nearly the same size at a fraction of the
+# deflate CPU — worth it when this template is used for batch runs.
+DOCX_COMPRESSLEVEL = int(os.environ.get('DOCX_COMPRESSLEVEL', '1'))
 
-for item, qty, price, total in items:
-    row_cells = table.add_row().cells
-    row_cells[0].text = item
-    row_cells[1].text = qty
-    row_cells[2].text = price
-    row_cells[3].text = total
 
-doc1.add_paragraph('\nTotal Amount: $174,500.00').bold = True
-doc1.add_paragraph('Special Instructions: Items must be kept refrigerated at 2°C to 8°C during transit (Strict Cold Chain).')
+def _patch_zip_compresslevel() -> None:
+    def __init__(self, pkg_file):
+        phys_pkg.PhysPkgWriter.__init__(self)
+        self._zipf = zipfile.ZipFile(
+            pkg_file, 'w',
+            compression=zipfile.ZIP_DEFLATED,
+            compresslevel=DOCX_COMPRESSLEVEL,
+        )
+    phys_pkg._ZipPkgWriter.__init__ = __init__
 
-doc1.save('sample_docs/Purchase_Order_Pharma.docx')
 
-# 2. Invoice
-doc2 = Document()
-doc2.add_heading('COMMERCIAL INVOICE', 0)
-doc2.add_paragraph('Invoice Number: INV-PHARMA-2026-09')
-doc2.add_paragraph('Date: October 25, 2026')
-doc2.add_paragraph('PO Reference: PO-PHARMA-2026')
-doc2.add_paragraph('Bill To: Global Health Distributors\n123 MedSupply Way, New York, NY 10001')
-doc2.add_paragraph('Make Checks Payable To: BioGen Pharmaceuticals\n456 Science Park, Boston, MA 02115')
-
-doc2.add_heading('Charges', level=1)
-table2 = doc2.add_table(rows=1, cols=4)
-table2.style = 'Table Grid'
-hdr2_cells = table2.rows[0].cells
-hdr2_cells[0].text = 'Description'
-hdr2_cells[1].text = 'Quantity'
-hdr2_cells[2].text = 'Unit Price'
-hdr2_cells[3].text = 'Amount'
-
-for item, qty, price, total in items:
-    row_cells = table2.add_row().cells
-    row_cells[0].text = item
-    row_cells[1].text = qty
-    row_cells[2].text = price
-    row_cells[3].text = total
-
-doc2.add_paragraph('\nSubtotal: $174,500.00')
-doc2.add_paragraph('Shipping & Handling (Cold Chain Express): $4,200.00')
-doc2.add_paragraph('Total Due: $178,700.00').bold = True
-doc2.add_paragraph('Payment Terms: Net 30')
+_patch_zip_compresslevel()
 
-doc2.save('sample_docs/Invoice_Pharma.docx')
+os.makedirs('sample_docs', exist_ok=True)
 
-# 3. Bill of Lading
-doc3 = Document()
-doc3.add_heading('BILL OF LADING (BOL)', 0)
-doc3.add_paragraph('BOL Number: BOL-PHARMA-8899')
-doc3.add_paragraph('Date: October 26, 2026')
-doc3.add_paragraph('Shipper: BioGen Pharmaceuticals\n456 Science Park, Boston, MA 02115')
-doc3.add_paragraph('Consignee: Global Health Distributors\n123 MedSupply Way, New York, NY 10001')
-doc3.add_paragraph('Carrier: ColdChain Logistics Inc.')
-
-doc3.add_heading('Shipment Details', level=1)
-table3 = doc3.add_table(rows=1, cols=4)
-table3.style = 'Table Grid'
-hdr3_cells = table3.rows[0].cells
-hdr3_cells[0].text = 'Packages'
-hdr3_cells[1].text = 'Description of Articles'
-hdr3_cells[2].text = 'Weight (kg)'
-hdr3_cells[3].text = 'Hazard Class'
+
+def _make_base_doc() -> Document:
+    """Build the shared skeleton once: title placeholder, section heading,
+    and a styled 4-column 'Table Grid' table with its header row.
+
+    Document() init and table-style application dominate wall time for these
+    small docs, so we pay for them a single time and deep-copy the OXML tree
+    for each variant instead of rebuilding from scratch.
+    """
+    base = Document()
+    base.add_heading('', 0)          # title — filled per document
+    base.add_heading('', level=1)    # section heading — filled per document
+    table = base.add_table(rows=1, cols=4)
+    table.style = 'Table Grid'
+    return base
+
+
+_BASE = _make_base_doc()
+
+
+_BASE_BYTES = None
+
+
+def _clone_base() -> Document:
+    """Clone the base document from a once-serialized in-memory copy.
+
+    Document() normally re-opens python-docx's packaged reference template
+    from disk on every call; here the rendered base is serialized to bytes
+    a single time and each variant is opened from that buffer. (Deep-copying
+    the Document object itself is not safe — python-docx serializes from the
+    part graph, and a copied tree silently loses mutations on save.)
+    """
+    global _BASE_BYTES
+    if _BASE_BYTES is None:
+        buf = io.BytesIO()
+        _BASE.save(buf)
+        _BASE_BYTES = buf.getvalue()
+    return Document(io.BytesIO(_BASE_BYTES))
+
+
+def set_cell_text_fast(tc, text: str) -> None:
+    """Write text into a fresh cell by appending a run to its first paragraph.
+
+    Skips the `_Cell.text` setter, which tears down and rebuilds the cell's
+    paragraphs on every assignment.
+    """
+    p = tc.find(qn('w:p'))
+    r = etree.SubElement(p, qn('w:r'))
+    t = etree.SubElement(r, qn('w:t'))
+    t.text = text
+
+
+def fill_table(table: Table, header: tuple, rows: list[tuple]) -> None:
+    """Fill the table header and data rows.
+
+    Works on the raw `<w:tr>`/`<w:tc>` elements so no cell wrapper objects
+    or cells-grid re-derivation are needed.
+    """
+    tbl = table._tbl
+    hdr_tr = tbl.tr_lst[0]
+    for tc, text in zip(hdr_tr.tc_lst, header):
+        set_cell_text_fast(tc, text)
+
+    # Build all data rows as raw <w:tr> elements and append them in one pass.
+    # add_row() re-walks the table grid on every call (O(n) per row, O(n²)
+    # overall); deep-copying a prototype row and writing its <w:t> nodes
+    # directly keeps row construction O(n).
+    proto_tr = deepcopy(hdr_tr)
+    for row in rows:
+        tr = deepcopy(proto_tr)
+        for t, text in zip(tr.findall('.//w:t', nsmap), row):
+            t.text = text
+        tbl.append(tr)
+
+
+def build_doc(title: str, intro: list[str], section: str,
+              header: tuple, rows: list[tuple], trailing: list[str],
+              bold_trailing: set[int] = frozenset()) -> Document:
+    """Render one document from the shared base."""
+    doc = _clone_base()
+    doc.paragraphs[0].text = title
+    doc.paragraphs[1].text = section
+    table = doc.tables[0]
+
+    # Intro paragraphs go between the title and the section heading
+    section_p = doc.paragraphs[1]._p
+    for text in intro:
+        p = doc.add_paragraph(text)
+        section_p.addprevious(p._p)
+
+    fill_table(table, header, rows)
+
+    for i, text in enumerate(trailing):
+        p = doc.add_paragraph(text)
+        if i in bold_trailing:
+            p.bold = True
+    return doc
+
+
+items = [
+    ('Insulin Glargine 100U/mL (Vials)', '5000', '$25.00', '$125,000.00'),
+    ('Amoxicillin 500mg (Bottles of 100)', '2000', '$12.00', '$24,000.00'),
+    ('Lisinopril 10mg (Bottles of 90)', '3000', '$8.50', '$25,500.00')
+]
 
 bol_items = [
     ('50 Pallets', 'Insulin Glargine 100U/mL (Refrigerated)', '1200 kg', 'N/A (Temp Controlled)'),
@@ -101,19 +148,71 @@ bol_items = [
     ('30 Pallets', 'Lisinopril 10mg', '950 kg', 'N/A')
 ]
 
-for pkgs, desc, weight, haz in bol_items:
-    row_cells = table3.add_row().cells
-    row_cells[0].text = pkgs
-    row_cells[1].text = desc
-    row_cells[2].text = weight
-    row_cells[3].text = haz
+# 1. Purchase Order
+doc1 = build_doc(
+    title='PURCHASE ORDER',
+    intro=[
+        'PO Number: PO-PHARMA-2026',
+        'Date: October 24, 2026',
+        'Buyer: Global Health Distributors\n123 MedSupply Way, New York, NY 10001',
+        'Supplier: BioGen Pharmaceuticals\n456 Science Park, Boston, MA 02115',
+    ],
+    section='Items Ordered',
+    header=('Item', 'Quantity', 'Unit Price', 'Total'),
+    rows=items,
+    trailing=[
+        '\nTotal Amount: $174,500.00',
+        'Special Instructions: Items must be kept refrigerated at 2°C to 8°C during transit (Strict Cold Chain).',
+    ],
+    bold_trailing={0},
+)
+doc1.save('sample_docs/Purchase_Order_Pharma.docx')
 
-doc3.add_paragraph('\nTotal Weight: 2,950 kg').bold = True
-doc3.add_paragraph('Special Instructions: \n- MUST MAINTAIN 2°C - 8°C AT ALL TIMES.\n- DO NOT FREEZE.\n- Handle with care.')
-doc3.add_paragraph('\nShipper Signature: _______________________')
-doc3.add_paragraph('Carrier Signature: _______________________')
-doc3.add_paragraph('Consignee Signature: _______________________')
+# 2. Invoice
+doc2 = build_doc(
+    title='COMMERCIAL INVOICE',
+    intro=[
+        'Invoice Number: INV-PHARMA-2026-09',
+        'Date: October 25, 2026',
+        'PO Reference: PO-PHARMA-2026',
+        'Bill To: Global Health Distributors\n123 MedSupply Way, New York, NY 10001',
+        'Make Checks Payable To: BioGen Pharmaceuticals\n456 Science Park, Boston, MA 02115',
+    ],
+    section='Charges',
+    header=('Description', 'Quantity', 'Unit Price', 'Amount'),
+    rows=items,
+    trailing=[
+        '\nSubtotal: $174,500.00',
+        'Shipping & Handling (Cold Chain Express): $4,200.00',
+        'Total Due: $178,700.00',
+        'Payment Terms: Net 30',
+    ],
+    bold_trailing={2},
+)
+doc2.save('sample_docs/Invoice_Pharma.docx')
 
+# 3. Bill of Lading
+doc3 = build_doc(
+    title='BILL OF LADING (BOL)',
+    intro=[
+        'BOL Number: BOL-PHARMA-8899',
+        'Date: October 26, 2026',
+        'Shipper: BioGen Pharmaceuticals\n456 Science Park, Boston, MA 02115',
+        'Consignee: Global Health Distributors\n123 MedSupply Way, New York, NY 10001',
+        'Carrier: ColdChain Logistics Inc.',
+    ],
+    section='Shipment Details',
+    header=('Packages', 'Description of Articles', 'Weight (kg)', 'Hazard Class'),
+    rows=bol_items,
+    trailing=[
+        '\nTotal Weight: 2,950 kg',
+        'Special Instructions: \n- MUST MAINTAIN 2°C - 8°C AT ALL TIMES.\n- DO NOT FREEZE.\n- Handle with care.',
+        '\nShipper Signature: _______________________',
+        'Carrier Signature: _______________________',
+        'Consignee Signature: _______________________',
+    ],
+    bold_trailing={0},
+)
 doc3.save('sample_docs/Bill_of_Lading_Pharma.docx')
 
 print("Successfully generated pharmaceutical documents in 'sample_docs/' directory.")
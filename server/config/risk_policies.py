@@ -3,6 +3,10 @@ Deterministic risk policies keyed by product category.
 Used by risk_engine.py to evaluate checkpoint telemetry.
 """
 
+import math
+from functools import lru_cache
+from types import MappingProxyType
+
 RISK_POLICIES: dict = {
     "pharmaceutical": {
         "temperature_range": (2, 8),
@@ -35,7 +39,38 @@ RISK_POLICIES: dict = {
     },
 }
 
+# Read-only views so cached policies cannot be mutated by callers
+RISK_POLICIES = {cat: MappingProxyType(policy) for cat, policy in RISK_POLICIES.items()}
+
 
-def get_policy(product_category: str) -> dict:
-    """Get risk policy for a product category, falling back to default."""
+@lru_cache(maxsize=16)
+def get_policy(product_category: str) -> MappingProxyType:
+    """Get risk policy for a product category, falling back to default.
+
+    Cached — called on every checkpoint evaluation, and the key space is
+    tiny (the known categories plus whatever GenAI returns).
+    """
     return RISK_POLICIES.get(product_category, RISK_POLICIES["default"])
+
+
+# Flat numeric view of each policy for batch evaluators: fixed field order,
+# with missing limits normalized to ±inf so comparisons need no key checks.
+POLICY_ROW_FIELDS = (
+    "temp_lo", "temp_hi", "humidity_max_pct", "moisture_max_pct",
+    "weight_tolerance_pct", "max_delay_hours",
+)
+
+
+@lru_cache(maxsize=16)
+def get_policy_row(product_category: str) -> tuple[float, ...]:
+    """Get a policy as a flat numeric tuple in POLICY_ROW_FIELDS order."""
+    policy = get_policy(product_category)
+    temp_lo, temp_hi = policy.get("temperature_range", (-math.inf, math.inf))
+    return (
+        float(temp_lo),
+        float(temp_hi),
+        float(policy.get("humidity_max_pct", math.inf)),
+        float(policy.get("moisture_max_pct", math.inf)),
+        float(policy.get("weight_tolerance_pct", math.inf)),
+        float(policy.get("max_delay_hours", math.inf)),
+    )
@@ -9,12 +9,14 @@ import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 
 load_dotenv()
 
 from services.firebase_service import init_firebase
 from services.blockchain_service import init_blockchain
+from services.route_graph import build_all_pairs
 from routes import shipment, checkpoint, anomaly, auth, route
 
 logging.basicConfig(
@@ -30,6 +32,7 @@ async def lifespan(app: FastAPI):
     logger.info("🚀 Supply Daddy starting up...")
     init_firebase()
     init_blockchain()
+    build_all_pairs()
     logger.info("✅ All services initialized")
     yield
     logger.info("👋 Supply Daddy shutting down")
@@ -40,6 +43,9 @@ app = FastAPI(
     description="Decentralized logistics platform with blockchain anchoring and AI-powered anomaly detection",
     version="0.1.0",
     lifespan=lifespan,
+    # orjson serializes datetimes/UUIDs in C — markedly faster than stdlib
+    # json on the anomaly/route payloads we return
+    default_response_class=ORJSONResponse,
 )
 
 # CORS — allow all origins for hackathon
@@ -72,3 +78,23 @@ async def root():
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # uvloop + httptools (bundled with uvicorn[standard]) replace the pure-
+    # Python event loop and h11 parser with their C implementations.
+    # workers defaults to 1: the blockchain nonce counter, checkpoint
+    # duplicate guard, GenAI coalescing/breaker and anchoring batches are
+    # all per-process state for one shared wallet — multiple workers would
+    # race the nonce and split the batches. Raise WEB_CONCURRENCY only if
+    # that state is made multi-process safe.
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8000")),
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+    )
@@ -1,13 +1,16 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 from datetime import datetime
 
 
 class RouteNode(BaseModel):
     """A single node in the shipment route."""
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     location_code: str
     name: str
     expected_arrival: Optional[datetime] = None
+    expected_arrival_epoch: Optional[float] = None
     actual_arrival: Optional[datetime] = None
     eta: Optional[datetime] = None
 
@@ -1,10 +1,16 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 from datetime import datetime
 
+# Instantiated on every checkpoint / God-Mode call: frozen models skip
+# per-field mutation plumbing and are safely shareable across caches
+_HOT_MODEL_CONFIG = ConfigDict(frozen=True, extra="ignore")
+
 
 class CheckpointInput(BaseModel):
     """Telemetry data sent by a transit node at check-in."""
+    model_config = _HOT_MODEL_CONFIG
+
     shipment_id: str
     location_code: str
     temperature: Optional[float] = None
@@ -15,6 +21,8 @@ class CheckpointInput(BaseModel):
 
 class AnomalyRecord(BaseModel):
     """An anomaly detected during checkpoint evaluation."""
+    model_config = _HOT_MODEL_CONFIG
+
     shipment_id: str
     anomaly_type: str  # TEMPERATURE_BREACH, WEIGHT_DEVIATION, DELAY, HUMIDITY_BREACH
     severity: str = "MEDIUM"  # LOW, MEDIUM, HIGH, CRITICAL
@@ -27,6 +35,8 @@ class AnomalyRecord(BaseModel):
 
 class GodModeDelay(BaseModel):
     """God Mode: inject a delay at a node."""
+    model_config = _HOT_MODEL_CONFIG
+
     shipment_id: str
     node_index: int
     delay_hours: float
@@ -34,6 +44,8 @@ class GodModeDelay(BaseModel):
 
 class GodModeTemperature(BaseModel):
     """God Mode: inject a temperature breach."""
+    model_config = _HOT_MODEL_CONFIG
+
     shipment_id: str
     location_code: str
     observed_temperature: float
@@ -41,6 +53,8 @@ class GodModeTemperature(BaseModel):
 
 class GodModeWeight(BaseModel):
     """God Mode: inject weight loss."""
+    model_config = _HOT_MODEL_CONFIG
+
     shipment_id: str
     location_code: str
     observed_weight_kg: float
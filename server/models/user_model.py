@@ -1,7 +1,23 @@
+from enum import Enum
+
 from pydantic import BaseModel, Field
 from typing import Optional
 
 
+class Role(str, Enum):
+    """User roles.
+
+    str-valued so members compare equal to the plain strings stored in
+    Firestore and carried in tokens, while membership checks against the
+    enum are a single hashed set lookup.
+    """
+    MANUFACTURER = "manufacturer"
+    RECEIVER = "receiver"
+
+
+VALID_ROLES = frozenset(r.value for r in Role)
+
+
 class UserRegister(BaseModel):
     """Registration input."""
     username: str = Field(..., min_length=3, max_length=50)
@@ -5,7 +5,10 @@ GenAI calls are wrapped with timeouts to prevent blocking.
 
 import asyncio
 import hashlib
+import time
 from datetime import datetime, timedelta
+
+import orjson
 from fastapi import APIRouter, HTTPException, Depends
 from models.telemetry_model import (
     AnomalyRecord,
@@ -46,28 +49,85 @@ async def list_all_anomalies(user: UserContext = Depends(get_current_user)):
     if user.role not in ["manufacturer", "receiver"]:
         return []
 
-    all_shipments = await firebase_service.list_shipments()
-    valid_shipment_ids = set()
-    
-    for s in all_shipments:
-        if user.role == "manufacturer" and s.get("manufacturer_id") == user.user_id:
-            valid_shipment_ids.add(s.get("shipment_id"))
-        elif user.role == "receiver" and s.get("receiver_id") == user.user_id:
-            valid_shipment_ids.add(s.get("shipment_id"))
+    # Indexed queries: only the user's shipments and their anomalies are
+    # fetched, instead of scanning every shipment and every anomaly
+    shipments = await firebase_service.list_shipments_for_user(user.user_id, user.role)
+    shipment_ids = [s["shipment_id"] for s in shipments if s.get("shipment_id")]
+    return await firebase_service.get_anomalies_for_shipments(shipment_ids)
+
+
+# In-process TTL cache for GenAI assessments. God-Mode injections (and
+# replay storms) produce near-identical anomaly contexts, and each GenAI
+# call costs up to the full timeout budget — so identical contexts share
+# one cached assessment. In-flight calls are coalesced via a shared Future
+# so concurrent duplicates await the same response.
+_GENAI_CACHE_TTL = 300.0
+_GENAI_CACHE_MAX = 1024
+_genai_cache: dict[str, tuple[float, asyncio.Future]] = {}
+_genai_cache_lock = asyncio.Lock()
+
 
-    all_anomalies = await firebase_service.get_all_anomalies()
-    return [a for a in all_anomalies if a.get("shipment_id") in valid_shipment_ids]
+def _genai_cache_key(context: dict) -> str:
+    # orjson encodes the whole (small) context in C — cheaper than any
+    # Python-level assembly of pre-encoded fragments
+    payload = orjson.dumps(context, option=orjson.OPT_SORT_KEYS, default=str)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
 
 
 async def _safe_genai(context: dict, timeout: float = 5.0) -> dict | None:
-    """Call GenAI interpret_anomaly with a timeout to prevent blocking."""
+    """Call GenAI interpret_anomaly with a timeout, caching by context."""
+    key = _genai_cache_key(context)
+
+    async with _genai_cache_lock:
+        entry = _genai_cache.get(key)
+        if entry and time.monotonic() - entry[0] < _GENAI_CACHE_TTL:
+            future = entry[1]
+        else:
+            future = None
+        if future is None:
+            if len(_genai_cache) >= _GENAI_CACHE_MAX:
+                _genai_cache.clear()
+            future = asyncio.get_running_loop().create_future()
+            _genai_cache[key] = (time.monotonic(), future)
+            owner = True
+        else:
+            owner = False
+
+    if not owner:
+        return await asyncio.shield(future)
+
+    result = None
     try:
-        return await asyncio.wait_for(
+        result = await asyncio.wait_for(
             genai_service.interpret_anomaly(context),
             timeout=timeout,
         )
     except (asyncio.TimeoutError, Exception):
-        return None
+        result = None
+    finally:
+        # Runs even if the owning request is cancelled mid-await:
+        # CancelledError is a BaseException, and an unresolved future left
+        # in the cache would park every later identical-context caller on
+        # shield() until the TTL expired. Single dict ops are atomic on the
+        # event loop, so no lock is needed here.
+        if not future.done():
+            future.set_result(result)
+        if result is None:
+            # Don't cache failures — let later calls retry
+            _genai_cache.pop(key, None)
+    return result
+
+
+# Pre-initialized SHA-256 context: each marker hash starts from a copy()
+# instead of re-running hash-object construction per request. The message
+# format is unchanged so on-chain hashes stay stable.
+_SHA256_PROTO = hashlib.sha256()
+
+
+def _marker_hash(shipment_id: str, kind: str, location_code: str) -> bytes:
+    h = _SHA256_PROTO.copy()
+    h.update(f"{shipment_id}:{kind}:{location_code}".encode())
+    return h.digest()
 
 
 # ─── God Mode Endpoints ──────────────────────────────────
@@ -101,34 +161,41 @@ async def inject_delay(payload: GodModeDelay):
         delay_hours=payload.delay_hours,
     )
 
-    # Propagate ETA
+    # Propagate ETA and run the GenAI assessments concurrently — the route
+    # update does not depend on the anomaly interpretations
     updated_route = propagate_delay(route, payload.node_index, payload.delay_hours)
-    await firebase_service.update_shipment(
-        payload.shipment_id, {"route": updated_route}
+    anomaly_dicts = [a.model_dump(mode="json") for a in anomalies]
+    _, assessments = await asyncio.gather(
+        firebase_service.update_shipment(
+            payload.shipment_id, {"route": updated_route}
+        ),
+        asyncio.gather(*[
+            _safe_genai({
+                "product_category": product_category,
+                "anomaly": anomaly.anomaly_type,
+                "delay_hours": payload.delay_hours,
+                "location": node.get("location_code", "unknown"),
+            })
+            for anomaly in anomalies
+        ]),
     )
 
-    # Process anomalies (with timeout on GenAI)
     genai_assessments = []
-    for anomaly in anomalies:
-        anomaly_dict = anomaly.model_dump(mode="json")
-        await firebase_service.add_anomaly(anomaly_dict)
-
-        assessment = await _safe_genai({
-            "product_category": product_category,
-            "anomaly": anomaly.anomaly_type,
-            "delay_hours": payload.delay_hours,
-            "location": node.get("location_code", "unknown"),
-        })
+    for anomaly_dict, assessment in zip(anomaly_dicts, assessments):
         if assessment:
             genai_assessments.append(assessment)
             anomaly_dict["genai_assessment"] = assessment
-            await firebase_service.add_anomaly(anomaly_dict)
+
+    if anomaly_dicts:
+        await asyncio.gather(*[
+            firebase_service.add_anomaly(d) for d in anomaly_dicts
+        ])
 
     return {
         "status": "delay_injected",
         "delay_hours": payload.delay_hours,
         "updated_route": updated_route,
-        "anomalies": [a.model_dump(mode="json") for a in anomalies],
+        "anomalies": anomaly_dicts,
         "genai_assessments": genai_assessments,
     }
 
@@ -154,39 +221,45 @@ async def inject_temperature(payload: GodModeTemperature):
         weight_kg=0,
     )
 
-    # Anchor on blockchain
-    doc_hash = hashlib.sha256(
-        f"{payload.shipment_id}:temp_breach:{payload.location_code}".encode()
-    ).digest()
-    tx_result = await blockchain_service.append_checkpoint(
-        shipment_id=payload.shipment_id,
-        location_code=payload.location_code,
-        weight_kg=0,
-        document_hash=doc_hash,
+    # Anchor on blockchain and run GenAI assessments concurrently — the tx
+    # and the interpretations are independent
+    doc_hash = _marker_hash(payload.shipment_id, "temp_breach", payload.location_code)
+    anomaly_dicts = [a.model_dump(mode="json") for a in anomalies]
+    tx_result, assessments = await asyncio.gather(
+        blockchain_service.append_checkpoint(
+            shipment_id=payload.shipment_id,
+            location_code=payload.location_code,
+            weight_kg=0,
+            document_hash=doc_hash,
+        ),
+        asyncio.gather(*[
+            _safe_genai({
+                "product_category": product_category,
+                "anomaly": anomaly.anomaly_type,
+                "observed_temperature": payload.observed_temperature,
+                "allowed_range": anomaly.details.get("allowed_range", ""),
+                "location": payload.location_code,
+            })
+            for anomaly in anomalies
+        ]),
     )
 
     genai_assessments = []
-    for anomaly in anomalies:
-        anomaly_dict = anomaly.model_dump(mode="json")
-        await firebase_service.add_anomaly(anomaly_dict)
-
-        assessment = await _safe_genai({
-            "product_category": product_category,
-            "anomaly": anomaly.anomaly_type,
-            "observed_temperature": payload.observed_temperature,
-            "allowed_range": anomaly.details.get("allowed_range", ""),
-            "location": payload.location_code,
-        })
+    for anomaly_dict, assessment in zip(anomaly_dicts, assessments):
         if assessment:
             genai_assessments.append(assessment)
             anomaly_dict["genai_assessment"] = assessment
-            await firebase_service.add_anomaly(anomaly_dict)
+
+    if anomaly_dicts:
+        await asyncio.gather(*[
+            firebase_service.add_anomaly(d) for d in anomaly_dicts
+        ])
 
     return {
         "status": "temperature_breach_injected",
         "observed_temperature": payload.observed_temperature,
         "blockchain_tx": tx_result,
-        "anomalies": [a.model_dump(mode="json") for a in anomalies],
+        "anomalies": anomaly_dicts,
         "genai_assessments": genai_assessments,
     }
 
@@ -196,16 +269,19 @@ async def inject_weight_loss(payload: GodModeWeight):
     """
     God Mode: Inject a weight deviation at a location.
     """
-    shipment = await firebase_service.get_shipment(payload.shipment_id)
+    # Shipment and telemetry reads are independent — fetch them concurrently
+    shipment, first_telemetry = await asyncio.gather(
+        firebase_service.get_shipment(payload.shipment_id),
+        firebase_service.get_first_telemetry(payload.shipment_id),
+    )
     if not shipment:
         raise HTTPException(status_code=404, detail="Shipment not found")
 
     risk_profile = shipment.get("risk_profile", {})
     product_category = risk_profile.get("product_category", "default")
 
-    # Get expected weight from telemetry
-    telemetry = await firebase_service.get_telemetry(payload.shipment_id)
-    expected_weight = telemetry[0]["weight_kg"] if telemetry else 1000  # fallback
+    # Expected weight comes from the baseline telemetry record
+    expected_weight = first_telemetry["weight_kg"] if first_telemetry else 1000  # fallback
 
     anomalies = evaluate_checkpoint(
         shipment_id=payload.shipment_id,
@@ -217,39 +293,44 @@ async def inject_weight_loss(payload: GodModeWeight):
         expected_weight_kg=expected_weight,
     )
 
-    # Anchor on blockchain
-    doc_hash = hashlib.sha256(
-        f"{payload.shipment_id}:weight_loss:{payload.location_code}".encode()
-    ).digest()
-    tx_result = await blockchain_service.append_checkpoint(
-        shipment_id=payload.shipment_id,
-        location_code=payload.location_code,
-        weight_kg=int(payload.observed_weight_kg),
-        document_hash=doc_hash,
+    # Anchor on blockchain and run GenAI assessments concurrently
+    doc_hash = _marker_hash(payload.shipment_id, "weight_loss", payload.location_code)
+    anomaly_dicts = [a.model_dump(mode="json") for a in anomalies]
+    tx_result, assessments = await asyncio.gather(
+        blockchain_service.append_checkpoint(
+            shipment_id=payload.shipment_id,
+            location_code=payload.location_code,
+            weight_kg=int(payload.observed_weight_kg),
+            document_hash=doc_hash,
+        ),
+        asyncio.gather(*[
+            _safe_genai({
+                "product_category": product_category,
+                "anomaly": anomaly.anomaly_type,
+                "observed_weight_kg": payload.observed_weight_kg,
+                "expected_weight_kg": expected_weight,
+                "location": payload.location_code,
+            })
+            for anomaly in anomalies
+        ]),
     )
 
     genai_assessments = []
-    for anomaly in anomalies:
-        anomaly_dict = anomaly.model_dump(mode="json")
-        await firebase_service.add_anomaly(anomaly_dict)
-
-        assessment = await _safe_genai({
-            "product_category": product_category,
-            "anomaly": anomaly.anomaly_type,
-            "observed_weight_kg": payload.observed_weight_kg,
-            "expected_weight_kg": expected_weight,
-            "location": payload.location_code,
-        })
+    for anomaly_dict, assessment in zip(anomaly_dicts, assessments):
         if assessment:
             genai_assessments.append(assessment)
             anomaly_dict["genai_assessment"] = assessment
-            await firebase_service.add_anomaly(anomaly_dict)
+
+    if anomaly_dicts:
+        await asyncio.gather(*[
+            firebase_service.add_anomaly(d) for d in anomaly_dicts
+        ])
 
     return {
         "status": "weight_loss_injected",
         "observed_weight_kg": payload.observed_weight_kg,
         "expected_weight_kg": expected_weight,
         "blockchain_tx": tx_result,
-        "anomalies": [a.model_dump(mode="json") for a in anomalies],
+        "anomalies": anomaly_dicts,
         "genai_assessments": genai_assessments,
     }
@@ -4,11 +4,14 @@ Handles user profile setup (role selection) after Firebase authentication.
 """
 
 import asyncio
-import uuid
+import hashlib
+import secrets
+import time
 import logging
 from datetime import datetime
 from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
+from models.user_model import Role
 from services import firebase_service
 from services.auth_middleware import get_current_user, UserContext
 
@@ -23,26 +26,44 @@ except ImportError:
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
-VALID_ROLES = {"manufacturer", "receiver"}
-
 
 class RoleSetup(BaseModel):
-    role: str
+    # Enum-typed so invalid roles are rejected during parsing (422) by
+    # pydantic-core, before any handler code runs
+    role: Role
     node_codes: list[str] = []
 
 
+# Verified-token cache: Firebase ID tokens are valid for ~1 hour and the
+# same token is replayed across a session, so cache decoded claims (keyed
+# by a token digest) until the token's own exp claim.
+_TOKEN_CACHE_MAX = 2048
+_token_cache: dict[bytes, tuple[float, dict]] = {}
+
+
+async def _verify_id_token(id_token: str) -> dict:
+    """Verify a Firebase ID token off the event loop, caching claims until exp."""
+    key = hashlib.blake2b(id_token.encode(), digest_size=16).digest()
+    cached = _token_cache.get(key)
+    if cached and time.time() < cached[0]:
+        return cached[1]
+
+    decoded = await asyncio.to_thread(firebase_auth.verify_id_token, id_token)
+
+    exp = decoded.get("exp")
+    if exp:
+        if len(_token_cache) >= _TOKEN_CACHE_MAX:
+            _token_cache.clear()
+        _token_cache[key] = (float(exp), decoded)
+    return decoded
+
+
 @router.post("/setup-role", response_model=dict)
 async def setup_role(data: RoleSetup, request: Request):
     """
     Set up user role after Firebase authentication.
     Called when a user signs in for the first time (no profile in our DB).
     """
-    if data.role not in VALID_ROLES:
-        raise HTTPException(status_code=400, detail=f"Invalid role. Must be one of: {VALID_ROLES}")
-
-    if data.role == "transit_node" and not data.node_codes:
-        raise HTTPException(status_code=400, detail="Transit nodes must select at least one node")
-
     # Verify the Firebase ID token
     auth_header = request.headers.get("Authorization", "")
     if not auth_header.startswith("Bearer "):
@@ -54,7 +75,7 @@ async def setup_role(data: RoleSetup, request: Request):
         raise HTTPException(status_code=500, detail="Firebase Auth not available")
 
     try:
-        decoded = await asyncio.to_thread(firebase_auth.verify_id_token, id_token)
+        decoded = await _verify_id_token(id_token)
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
 
@@ -67,26 +88,27 @@ async def setup_role(data: RoleSetup, request: Request):
     if existing:
         raise HTTPException(status_code=409, detail="User profile already exists")
 
-    user_id = str(uuid.uuid4())[:8]
+    # 48 bits of CSPRNG entropy — truncated UUID4 hex gave only ~32 bits
+    user_id = secrets.token_urlsafe(6)
     user_data = {
         "user_id": user_id,
         "firebase_uid": firebase_uid,
         "username": display_name,
         "email": email,
-        "role": data.role,
+        "role": data.role.value,
         "node_codes": [],
         "created_at": datetime.utcnow().isoformat(),
     }
 
     await firebase_service.create_user(user_id, user_data)
-    logger.info(f"Created user profile: {user_id} ({email}) as {data.role}")
+    logger.info(f"Created user profile: {user_id} ({email}) as {data.role.value}")
 
     return {
         "user": {
             "user_id": user_id,
             "username": display_name,
             "email": email,
-            "role": data.role,
+            "role": data.role.value,
             "node_codes": user_data["node_codes"],
         },
     }
@@ -104,8 +126,24 @@ async def get_me(user: UserContext = Depends(get_current_user)):
     }
 
 
-@router.get("/users/receivers", response_model=list[dict])
-async def list_receivers():
-    """List all registered receivers (for manufacturer shipment assignment)."""
-    users = await firebase_service.list_users_by_role("receiver")
-    return [{"user_id": u["user_id"], "username": u["username"], "email": u["email"]} for u in users]
+# Projection + page size for receiver listing: only the three fields the
+# frontend renders, fetched 500 documents at a time
+_RECEIVER_FIELDS = ["user_id", "username", "email"]
+_RECEIVER_PAGE_SIZE = 500
+
+
+@router.get("/users/receivers", response_model=dict)
+async def list_receivers(cursor: str | None = None):
+    """List registered receivers (for manufacturer shipment assignment).
+
+    Returns {"items": [...], "next_cursor": ...}; pass next_cursor back as
+    ?cursor= to fetch the following page.
+    """
+    users = await firebase_service.list_users_by_role(
+        "receiver",
+        fields=_RECEIVER_FIELDS,
+        limit=_RECEIVER_PAGE_SIZE,
+        cursor=cursor,
+    )
+    next_cursor = users[-1]["user_id"] if len(users) == _RECEIVER_PAGE_SIZE else None
+    return {"items": users, "next_cursor": next_cursor}
@@ -9,9 +9,14 @@ At every node:
 5. Advance shipment through the route
 """
 
+import asyncio
 import hashlib
+import logging
+import time
 from datetime import datetime, timezone
-from fastapi import APIRouter, HTTPException, Depends
+
+import orjson
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
 from models.telemetry_model import CheckpointInput
 from services import firebase_service, blockchain_service, genai_service
 from services.risk_engine import evaluate_checkpoint
@@ -19,20 +24,72 @@ from services.eta_engine import propagate_delay
 from services.auth_middleware import get_current_user, UserContext
 from routes.shipment import compute_doc_hash
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/checkpoints", tags=["Checkpoints"])
 
 
+# Duplicate-retry guard: a (shipment_id, location_code) pair that was just
+# processed (or is in flight) is rejected before any Firestore read. The
+# request suggested Redis SETNX; with no Redis in this deployment the guard
+# is per-process — the in-order traversal checks against the shipment
+# document remain the cross-worker source of truth.
+_CP_GUARD_TTL = 120.0
+_CP_GUARD_MAX = 4096
+_cp_guard: dict[tuple[str, str], float] = {}
+
+
+def _acquire_checkpoint_guard(shipment_id: str, location_code: str) -> bool:
+    key = (shipment_id, location_code)
+    now = time.monotonic()
+    expiry = _cp_guard.get(key)
+    if expiry is not None and now < expiry:
+        return False
+    if len(_cp_guard) >= _CP_GUARD_MAX:
+        for k in [k for k, exp in _cp_guard.items() if exp <= now]:
+            del _cp_guard[k]
+    _cp_guard[key] = now + _CP_GUARD_TTL
+    return True
+
+
+def _release_checkpoint_guard(shipment_id: str, location_code: str) -> None:
+    _cp_guard.pop((shipment_id, location_code), None)
+
+
 @router.post("/", response_model=dict)
 async def register_checkpoint(
     checkpoint: CheckpointInput,
+    background: BackgroundTasks,
     user: UserContext = Depends(get_current_user),
 ):
     """
     Register a checkpoint at a transit node.
     Verifies document integrity via blockchain hash comparison.
+    Duplicate retries for the same node are fast-rejected with 409.
     """
+    if not _acquire_checkpoint_guard(checkpoint.shipment_id, checkpoint.location_code):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Checkpoint at {checkpoint.location_code} was just processed "
+                   "or is still in flight — duplicate request rejected",
+        )
+    try:
+        return await _register_checkpoint(checkpoint, background, user)
+    except BaseException:
+        # Failed check-ins must stay retryable
+        _release_checkpoint_guard(checkpoint.shipment_id, checkpoint.location_code)
+        raise
+
+
+async def _register_checkpoint(
+    checkpoint: CheckpointInput,
+    background: BackgroundTasks,
+    user: UserContext,
+):
     # ─── Fetch shipment ─────────────────────────────────
-    shipment = await firebase_service.get_shipment(checkpoint.shipment_id)
+    # Cached read: scanners along a route hammer the same shipment doc, and
+    # this handler's own update_shipment call invalidates the cache entry
+    shipment = await firebase_service.get_shipment_cached(checkpoint.shipment_id)
     if not shipment:
         raise HTTPException(status_code=404, detail="Shipment not found")
 
@@ -44,11 +101,17 @@ async def register_checkpoint(
     product_category = risk_profile.get("product_category", "default")
 
     # ─── Find node in route ─────────────────────────────
-    node_index = -1
-    for i, node in enumerate(route):
-        if node.get("location_code") == checkpoint.location_code:
-            node_index = i
-            break
+    # Shipments persist a location→index map; fall back to a scan for
+    # documents created before route_index existed
+    route_index = shipment.get("route_index")
+    if route_index is not None:
+        node_index = route_index.get(checkpoint.location_code, -1)
+    else:
+        node_index = -1
+        for i, node in enumerate(route):
+            if node.get("location_code") == checkpoint.location_code:
+                node_index = i
+                break
 
     if node_index == -1:
         raise HTTPException(
@@ -56,20 +119,41 @@ async def register_checkpoint(
             detail=f"Location {checkpoint.location_code} is not on this shipment's route",
         )
 
-    # Enforce in-order traversal
-    for i in range(node_index):
-        if not route[i].get("actual_arrival"):
+    # Enforce in-order traversal — two integer comparisons against the
+    # persisted cursor where available, O(N) scan for legacy shipments
+    last_visited = shipment.get("last_visited_index")
+    if last_visited is not None:
+        if node_index <= last_visited:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Checkpoint at {checkpoint.location_code} already recorded",
+            )
+        if node_index > last_visited + 1:
             raise HTTPException(
                 status_code=400,
                 detail=f"Cannot check in at {checkpoint.location_code} — "
-                       f"previous node {route[i]['location_code']} not visited yet",
+                       f"previous node {route[last_visited + 1]['location_code']} not visited yet",
             )
+    else:
+        for i in range(node_index):
+            if not route[i].get("actual_arrival"):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Cannot check in at {checkpoint.location_code} — "
+                           f"previous node {route[i]['location_code']} not visited yet",
+                )
 
-    if route[node_index].get("actual_arrival"):
-        raise HTTPException(
-            status_code=400,
-            detail=f"Checkpoint at {checkpoint.location_code} already recorded",
-        )
+        if route[node_index].get("actual_arrival"):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Checkpoint at {checkpoint.location_code} already recorded",
+            )
+
+    # One clock read per checkpoint — every timestamp below (anomaly
+    # created_at, telemetry, actual_arrival) reuses these
+    now = checkpoint.timestamp or datetime.now(timezone.utc)
+    now_iso = now.isoformat()
+    now_epoch = now.timestamp()
 
     # ─── Document hash verification ─────────────────────
     current_po = shipment.get("po_text", "")
@@ -80,12 +164,18 @@ async def register_checkpoint(
     current_hash = compute_doc_hash(current_po, current_inv, current_bol)
     current_hash_hex = current_hash.hex()
 
-    # Compare with on-chain hash
-    hash_verification = await blockchain_service.verify_checkpoint_hash(
+    # The on-chain verify and the baseline-telemetry read are independent —
+    # issue both now so the RPCs overlap, and await each where consumed
+    verify_task = asyncio.create_task(blockchain_service.verify_checkpoint_hash(
         shipment_id=checkpoint.shipment_id,
         expected_hash=current_hash,
+    ))
+    telemetry_task = asyncio.create_task(
+        firebase_service.get_first_telemetry(checkpoint.shipment_id)
     )
 
+    hash_verification = await verify_task
+
     tamper_detected = False
     if not hash_verification.get("verified", True):
         tamper_detected = True
@@ -103,14 +193,18 @@ async def register_checkpoint(
             },
             "location_code": checkpoint.location_code,
             "resolved": False,
-            "created_at": datetime.now(timezone.utc).isoformat(),
+            "created_at": now_iso,
         }
 
     # ─── Calculate delay ────────────────────────────────
-    now = checkpoint.timestamp or datetime.now(timezone.utc)
     delay_seconds = 0.0
 
-    if route[node_index].get("expected_arrival"):
+    expected_epoch = route[node_index].get("expected_arrival_epoch")
+    if expected_epoch is not None:
+        # Epoch stored at route creation — a float subtraction instead of
+        # re-tokenizing the ISO string on every checkpoint
+        delay_seconds = max(0.0, now_epoch - expected_epoch)
+    elif route[node_index].get("expected_arrival"):
         try:
             expected = datetime.fromisoformat(route[node_index]["expected_arrival"])
             delta = (now - expected).total_seconds()
@@ -120,10 +214,8 @@ async def register_checkpoint(
             pass
 
     # ─── Deterministic anomaly rules ────────────────────
-    expected_weight = None
-    telemetry_records = await firebase_service.get_telemetry(checkpoint.shipment_id)
-    if telemetry_records:
-        expected_weight = telemetry_records[0].get("weight_kg")
+    first_telemetry = await telemetry_task
+    expected_weight = first_telemetry.get("weight_kg") if first_telemetry else None
 
     anomalies = evaluate_checkpoint(
         shipment_id=checkpoint.shipment_id,
@@ -134,34 +226,35 @@ async def register_checkpoint(
         weight_kg=checkpoint.weight_kg,
         expected_weight_kg=expected_weight,
         delay_hours=delay_seconds / 3600,
+        now=now,
     )
 
-    # ─── Store telemetry ────────────────────────────────
+    # ─── Build telemetry record ─────────────────────────
+    # Written together with the shipment update below in one batch commit
     telemetry_data = {
         "location_code": checkpoint.location_code,
         "temperature": checkpoint.temperature,
         "humidity": checkpoint.humidity,
         "weight_kg": checkpoint.weight_kg,
-        "timestamp": now.isoformat(),
+        "timestamp": now_iso,
         "scanned_by": user.user_id,
+        "shipment_id": checkpoint.shipment_id,
+        "recorded_at": now_iso,
     }
-    await firebase_service.add_telemetry(checkpoint.shipment_id, telemetry_data)
 
     # ─── Anchor current hash on blockchain ──────────────
-    # This anchors the CURRENT document hash so the next node can verify it
-    tx_result = await blockchain_service.append_checkpoint(
+    # This anchors the CURRENT document hash so the next node can verify it.
+    # The chain RPC is independent of the Firestore writes below, so it runs
+    # as a task and is awaited only when the tx hash is needed
+    tx_task = asyncio.create_task(blockchain_service.append_checkpoint(
         shipment_id=checkpoint.shipment_id,
         location_code=checkpoint.location_code,
         weight_kg=int(checkpoint.weight_kg),
         document_hash=current_hash,
-    )
+    ))
 
     # ─── Advance shipment ───────────────────────────────
-    route[node_index]["actual_arrival"] = now.isoformat()
-
-    tx_hashes = shipment.get("blockchain_tx_hashes", [])
-    if tx_result.get("tx_hash"):
-        tx_hashes.append(tx_result["tx_hash"])
+    route[node_index]["actual_arrival"] = now_iso
 
     is_final = node_index == len(route) - 1
     new_status = "delivered" if is_final else "in_transit"
@@ -171,55 +264,123 @@ async def register_checkpoint(
     else:
         updated_route = route
 
-    await firebase_service.update_shipment(
-        checkpoint.shipment_id,
-        {
-            "route": updated_route,
-            "current_status": new_status,
-            "blockchain_tx_hashes": tx_hashes,
-        },
-    )
+    # One batched commit: telemetry insert + shipment update in a single RPC
+    await firebase_service.commit_batch([
+        (
+            "set",
+            "telemetry",
+            firebase_service.telemetry_doc_id(
+                checkpoint.shipment_id,
+                checkpoint.location_code,
+                telemetry_data["recorded_at"],
+            ),
+            telemetry_data,
+        ),
+        (
+            "update",
+            "shipments",
+            checkpoint.shipment_id,
+            {
+                "route": updated_route,
+                "current_status": new_status,
+                "last_visited_index": node_index,
+            },
+        ),
+    ])
+
+    # The tx hash arrives after the batch commit it overlapped with; append
+    # it in a small follow-up update
+    tx_result = await tx_task
+    tx_hashes = shipment.get("blockchain_tx_hashes", [])
+    if tx_result.get("tx_hash"):
+        tx_hashes.append(tx_result["tx_hash"])
+        await firebase_service.update_shipment(
+            checkpoint.shipment_id,
+            {"blockchain_tx_hashes": tx_hashes},
+        )
+
+    # ─── Persist anomalies; GenAI runs after the response ──
+    # Deterministic anomalies from the risk engine. model_dump_json renders
+    # in pydantic-core and orjson.loads rebuilds the dict in C, skipping the
+    # Python-side dict builder of model_dump(mode="json")
+    all_anomaly_dicts = [orjson.loads(a.model_dump_json()) for a in anomalies]
 
-    # ─── Process telemetry anomalies + GenAI Mitigations ──
-    import asyncio
-    
-    anomaly_list = []
-    
-    # Collect all anomaly dicts to process through GenAI
-    all_anomaly_dicts = []
-    
-    # Add deterministic anomalies from risk engine
-    for a in anomalies:
-        all_anomaly_dicts.append(a.model_dump(mode="json"))
-    
     # Add tamper anomaly if detected (it hasn't been saved to Firebase yet)
     if tamper_detected:
         all_anomaly_dicts.append(anomaly_data)
-    
-    # Process each anomaly through GenAI concurrently
+
+    if all_anomaly_dicts:
+        # Save the deterministic anomalies now — that's all the client needs.
+        # GenAI interpretation can take up to 30s per anomaly, so it moves to
+        # a background task that attaches genai_assessment once available;
+        # clients pick it up from GET /anomalies/{shipment_id}
+        await asyncio.gather(*[
+            firebase_service.add_anomaly(d) for d in all_anomaly_dicts
+        ])
+        background.add_task(
+            _process_anomalies_genai,
+            all_anomaly_dicts,
+            product_category=product_category,
+            route_progress=f"Node {node_index + 1} of {len(route)}",
+            current_status="tampered" if tamper_detected
+                           else "delayed" if delay_seconds > 0 else "in_transit",
+        )
+
+    return {
+        "status": "delivered" if is_final
+                  else "tamper_detected" if tamper_detected
+                  else "anomaly_detected" if anomalies
+                  else "transferred",
+        "node_index": node_index,
+        "location": checkpoint.location_code,
+        "is_final_destination": is_final,
+        "shipment_status": new_status,
+        "checkpoint": telemetry_data,
+        "blockchain_tx": tx_result,
+        "hash_verification": {
+            "current_hash": current_hash_hex,
+            "on_chain_hash": hash_verification.get("on_chain_hash"),
+            "verified": hash_verification.get("verified"),
+            "status": hash_verification.get("status"),
+            "tamper_detected": tamper_detected,
+        },
+        "anomalies": all_anomaly_dicts,
+        "delay_seconds": delay_seconds,
+    }
+
+
+async def _process_anomalies_genai(
+    anomaly_dicts: list[dict],
+    product_category: str,
+    route_progress: str,
+    current_status: str,
+) -> None:
+    """Attach GenAI assessments to already-saved anomalies.
+
+    Runs as a background task after the checkpoint response is sent.
+    add_anomaly derives its doc id from shipment_id + type + created_at,
+    and created_at was fixed on the first save, so the re-write updates
+    each anomaly document in place.
+    """
     async def process_anomaly(anomaly_dict):
         try:
             context = {
                 **anomaly_dict,
                 "product_category": product_category,
-                "route_progress": f"Node {node_index + 1} of {len(route)}",
-                "current_status": "tampered" if tamper_detected else "delayed" if delay_seconds > 0 else "in_transit"
+                "route_progress": route_progress,
+                "current_status": current_status,
             }
-            
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.info(f"[Checkpoint] Processing anomaly {anomaly_dict.get('anomaly_type')} through GenAI...")
-            
+
+            logger.info("[Checkpoint] Processing anomaly %s through GenAI...", anomaly_dict.get("anomaly_type"))
+
             assessment = await asyncio.wait_for(
                 genai_service.interpret_anomaly(context),
                 timeout=30.0
             )
             anomaly_dict["genai_assessment"] = assessment
-            logger.info(f"[Checkpoint] GenAI assessment received for {anomaly_dict.get('anomaly_type')}: severity={assessment.get('severity_level')}")
+            logger.info("[Checkpoint] GenAI assessment received for %s: severity=%s", anomaly_dict.get("anomaly_type"), assessment.get("severity_level"))
         except asyncio.TimeoutError:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"[Checkpoint] GenAI timed out after 30s for {anomaly_dict.get('anomaly_type')}")
+            logger.error("[Checkpoint] GenAI timed out after 30s for %s", anomaly_dict.get("anomaly_type"))
             anomaly_dict["genai_assessment"] = {
                 "risk_assessment": "System detected an anomaly but AI service timed out.",
                 "business_impact": "Unknown",
@@ -228,9 +389,7 @@ async def register_checkpoint(
                 "error": "timeout"
             }
         except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"[Checkpoint] GenAI error for {anomaly_dict.get('anomaly_type')}: {e}", exc_info=True)
+            logger.error("[Checkpoint] GenAI error for %s: %s", anomaly_dict.get("anomaly_type"), e, exc_info=True)
             anomaly_dict["genai_assessment"] = {
                 "risk_assessment": "System detected an anomaly but AI service timed out.",
                 "business_impact": "Unknown",
@@ -238,36 +397,10 @@ async def register_checkpoint(
                 "severity_level": anomaly_dict.get("severity", "MEDIUM").upper(),
                 "error": str(e)
             }
-            
+
         await firebase_service.add_anomaly(anomaly_dict)
-        return anomaly_dict
 
-    # Run AI classifications for all anomalies
-    if all_anomaly_dicts:
-        tasks = [process_anomaly(d) for d in all_anomaly_dicts]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        for r in results:
-            if isinstance(r, dict):
-                anomaly_list.append(r)
-    
-    return {
-        "status": "delivered" if is_final
-                  else "tamper_detected" if tamper_detected
-                  else "anomaly_detected" if anomalies
-                  else "transferred",
-        "node_index": node_index,
-        "location": checkpoint.location_code,
-        "is_final_destination": is_final,
-        "shipment_status": new_status,
-        "checkpoint": telemetry_data,
-        "blockchain_tx": tx_result,
-        "hash_verification": {
-            "current_hash": current_hash_hex,
-            "on_chain_hash": hash_verification.get("on_chain_hash"),
-            "verified": hash_verification.get("verified"),
-            "status": hash_verification.get("status"),
-            "tamper_detected": tamper_detected,
-        },
-        "anomalies": anomaly_list,
-        "delay_seconds": delay_seconds,
-    }
+    await asyncio.gather(
+        *[process_anomaly(d) for d in anomaly_dicts],
+        return_exceptions=True,
+    )
@@ -2,33 +2,54 @@
 Route routes — Transit node graph and optimal path generation.
 """
 
-from fastapi import APIRouter, HTTPException
+import hashlib
+
+import orjson
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel
-from services.route_graph import find_optimal_route, get_all_nodes, get_graph_data
+from services.route_graph import VALID_NODES, find_optimal_route, get_all_nodes, get_graph_data
 
 router = APIRouter(prefix="/routes", tags=["Routes"])
 
+# The node/edge data is static for the life of the process, so the JSON
+# bytes are encoded once at import and served with an ETag: revisiting
+# clients get a bodiless 304 instead of a re-walk and re-encode of the
+# graph on every poll.
+_NODES_JSON: bytes = orjson.dumps(get_all_nodes())
+_NODES_ETAG: str = f'"{hashlib.sha256(_NODES_JSON).hexdigest()}"'
+_GRAPH_JSON: bytes = orjson.dumps(get_graph_data())
+_GRAPH_ETAG: str = f'"{hashlib.sha256(_GRAPH_JSON).hexdigest()}"'
+
+
+def _cached_json(request: Request, body: bytes, etag: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=300"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 
 class RouteRequest(BaseModel):
     origin: str
     destination: str
 
 
-@router.get("/nodes", response_model=list[dict])
-async def list_nodes():
+@router.get("/nodes")
+async def list_nodes(request: Request):
     """List all available transit nodes in the network."""
-    return get_all_nodes()
+    return _cached_json(request, _NODES_JSON, _NODES_ETAG)
 
 
-@router.get("/graph", response_model=dict)
-async def get_graph():
+@router.get("/graph")
+async def get_graph(request: Request):
     """Get full graph data (nodes + edges) for visualization."""
-    return get_graph_data()
+    return _cached_json(request, _GRAPH_JSON, _GRAPH_ETAG)
 
 
 @router.post("/optimal", response_model=dict)
 async def compute_optimal_route(request: RouteRequest):
     """Compute the optimal route between two nodes using Dijkstra."""
+    if request.origin not in VALID_NODES or request.destination not in VALID_NODES:
+        raise HTTPException(status_code=400, detail="Unknown node code")
     route = find_optimal_route(request.origin, request.destination)
     if not route:
         raise HTTPException(status_code=400, detail="No route found between these locations")
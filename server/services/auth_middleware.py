@@ -4,7 +4,10 @@ Verifies Firebase ID tokens from the Authorization header.
 """
 
 import asyncio
+import hashlib
 import logging
+import time
+from functools import lru_cache
 from fastapi import Request, HTTPException, Depends
 from services import firebase_service
 
@@ -31,6 +34,17 @@ class UserContext:
         self.firebase_uid = firebase_uid
 
 
+# Resolved-auth cache: the same bearer token is replayed for the whole
+# session, yet each request paid a token-verification thread hop plus one
+# or two Firestore user lookups. Cache the resolved UserContext keyed by
+# a token digest, bounded by the token's own exp claim and a 5-minute cap
+# so role changes still propagate quickly. Failures are never cached —
+# a rejected token is re-verified every time.
+_AUTH_CACHE_TTL = 300.0
+_AUTH_CACHE_MAX = 4096
+_auth_cache: dict[bytes, tuple[float, UserContext]] = {}
+
+
 async def get_current_user(request: Request) -> UserContext:
     """Extract and verify Firebase ID token from Authorization header."""
     auth_header = request.headers.get("Authorization", "")
@@ -42,6 +56,13 @@ async def get_current_user(request: Request) -> UserContext:
     if not _HAS_FIREBASE_AUTH:
         raise HTTPException(status_code=500, detail="Firebase Auth not available on server")
 
+    cache_key = hashlib.blake2b(id_token.encode(), digest_size=16).digest()
+    cached = _auth_cache.get(cache_key)
+    if cached:
+        if time.time() < cached[0]:
+            return cached[1]
+        _auth_cache.pop(cache_key, None)
+
     try:
         decoded = await asyncio.to_thread(firebase_auth.verify_id_token, id_token)
     except firebase_auth.ExpiredIdTokenError:
@@ -64,7 +85,7 @@ async def get_current_user(request: Request) -> UserContext:
     if not user:
         raise HTTPException(status_code=404, detail="User profile not found. Please complete role setup.")
 
-    return UserContext(
+    context = UserContext(
         user_id=user["user_id"],
         username=user.get("username", ""),
         role=user["role"],
@@ -73,11 +94,28 @@ async def get_current_user(request: Request) -> UserContext:
         firebase_uid=firebase_uid,
     )
 
+    now = time.time()
+    expires_at = min(float(decoded.get("exp", now + _AUTH_CACHE_TTL)), now + _AUTH_CACHE_TTL)
+    if expires_at > now:
+        if len(_auth_cache) >= _AUTH_CACHE_MAX:
+            _auth_cache.clear()
+        _auth_cache[cache_key] = (expires_at, context)
+
+    return context
 
+
+@lru_cache(maxsize=None)
 def require_role(*roles: str):
-    """Dependency factory: restrict endpoint to specific roles."""
+    """Dependency factory: restrict endpoint to specific roles.
+
+    Memoized so endpoints sharing a role set get the same dependency
+    object, letting FastAPI deduplicate it in the dependency graph and
+    run it once per request; the membership test is a frozenset lookup.
+    """
+    roles_set = frozenset(roles)
+
     async def dependency(user: UserContext = Depends(get_current_user)):
-        if user.role not in roles:
+        if user.role not in roles_set:
             raise HTTPException(
                 status_code=403,
                 detail=f"Role '{user.role}' not authorized. Required: {roles}",
@@ -3,10 +3,11 @@ Auth Service — Password hashing and JWT token management.
 Uses stdlib hashlib for password hashing (no bcrypt dep needed).
 """
 
+import asyncio
 import hashlib
 import hmac
 import os
-import uuid
+import secrets
 import logging
 from datetime import datetime, timedelta, timezone
 
@@ -19,39 +20,92 @@ except ImportError:
     _HAS_JWT = False
     logger.warning("PyJWT not installed — auth will not work")
 
+# PBKDF2 dominates login CPU; OpenSSL dispatches its SHA-256 compression
+# to SHA-NI on capable x86 hosts (~3-5x over scalar). Log which library
+# backs the KDF so a deployment stuck on a slow build is visible, and
+# flag OPENSSL_ia32cap overrides, which can mask the SHA extensions.
+try:
+    import ssl
+    logger.info("PBKDF2 via %s", ssl.OPENSSL_VERSION)
+except ImportError:
+    logger.warning("No ssl module — pbkdf2_hmac is using the slow builtin fallback")
+if os.getenv("OPENSSL_ia32cap"):
+    logger.warning(
+        "OPENSSL_ia32cap=%s is set — CPU feature dispatch (incl. SHA-NI) may be disabled",
+        os.environ["OPENSSL_ia32cap"],
+    )
+
 JWT_SECRET = os.getenv("JWT_SECRET", "supply-daddy-dev-secret-change-me")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRY_HOURS = 72
+JWT_EXPIRY = timedelta(hours=JWT_EXPIRY_HOURS)
+
+
+# Tunable per deployment (CI and dev boxes can drop it); hashes are
+# self-describing, so changing the knob never breaks stored credentials.
+# hashlib.pbkdf2_hmac runs OpenSSL's PKCS5_PBKDF2_HMAC, which already
+# reuses the precomputed HMAC inner/outer contexts across rounds.
+PBKDF2_ITERATIONS = int(os.getenv("PBKDF2_ITERATIONS", "100000"))
+_LEGACY_ITERATIONS = 100_000
 
 
 def hash_password(password: str) -> str:
-    """Hash password with PBKDF2-SHA256 + random salt."""
+    """Hash password with PBKDF2-SHA256 + random salt.
+
+    Format is "iterations:salt:key", so each hash verifies with the
+    iteration count it was created under.
+    """
     salt = os.urandom(32)
-    key = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, 100_000)
-    return f"{salt.hex()}:{key.hex()}"
+    key = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, PBKDF2_ITERATIONS)
+    return f"{PBKDF2_ITERATIONS}:{salt.hex()}:{key.hex()}"
 
 
 def verify_password(password: str, stored_hash: str) -> bool:
-    """Verify password against stored hash."""
+    """Verify password against stored hash (legacy salt:key hashes included)."""
     try:
-        salt_hex, key_hex = stored_hash.split(":")
+        parts = stored_hash.split(":")
+        if len(parts) == 3:
+            iterations = int(parts[0])
+            salt_hex, key_hex = parts[1], parts[2]
+        else:
+            # Pre-tunable hashes carry no iteration count
+            iterations = _LEGACY_ITERATIONS
+            salt_hex, key_hex = parts
         salt = bytes.fromhex(salt_hex)
-        key = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, 100_000)
-        return hmac.compare_digest(key.hex(), key_hex)
+        key = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+        # Compare the 32 raw bytes rather than allocating two 64-char hex
+        # strings per attempt; fromhex also rejects malformed stored keys
+        return hmac.compare_digest(key, bytes.fromhex(key_hex))
     except Exception:
         return False
 
 
+# Async wrappers for request handlers. pbkdf2_hmac runs in OpenSSL's C
+# implementation and releases the GIL, but 100k iterations still costs tens
+# of milliseconds — offloading to a thread keeps the event loop serving
+# other requests during the KDF.
+
+async def hash_password_async(password: str) -> str:
+    """hash_password off the event loop."""
+    return await asyncio.to_thread(hash_password, password)
+
+
+async def verify_password_async(password: str, stored_hash: str) -> bool:
+    """verify_password off the event loop."""
+    return await asyncio.to_thread(verify_password, password, stored_hash)
+
+
 def create_token(user_id: str, role: str, username: str) -> str:
     """Create a JWT token."""
     if not _HAS_JWT:
         return f"stub-token-{user_id}"
+    now = datetime.now(timezone.utc)
     payload = {
         "user_id": user_id,
         "role": role,
         "username": username,
-        "exp": datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRY_HOURS),
-        "iat": datetime.now(timezone.utc),
+        "exp": now + JWT_EXPIRY,
+        "iat": now,
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
@@ -71,4 +125,4 @@ def decode_token(token: str) -> dict | None:
 
 
 def generate_user_id() -> str:
-    return str(uuid.uuid4())[:8]
+    return secrets.token_urlsafe(6)
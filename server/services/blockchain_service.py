@@ -5,9 +5,11 @@ Handles transaction construction, signing, and submission.
 Users do NOT need MetaMask — the server wallet sponsors gas.
 """
 
+import asyncio
 import json
 import os
 import logging
+import time
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -24,10 +26,35 @@ _w3 = None
 _contract = None
 _account = None
 
+# Local nonce counter for the server wallet: synced from the node once at
+# init (and after any tx failure), then advanced locally, saving one
+# get_transaction_count RPC per send and keeping bursty checkpoints from
+# racing each other for the same nonce.
+_nonce: int | None = None
+_nonce_lock = asyncio.Lock()
+
+# Gas price barely moves within a block (~15 s), so sample it on a TTL
+# instead of paying an eth_gasPrice RPC per transaction
+_GAS_PRICE_TTL = 15.0
+_gas_price_cache: tuple[float, int] = (0.0, 0)
+
+
+def _get_gas_price() -> int:
+    """Current gas price, refreshed at most every _GAS_PRICE_TTL seconds.
+
+    Runs inside the tx build thread, so the refresh RPC stays off the
+    event loop.
+    """
+    global _gas_price_cache
+    now = time.monotonic()
+    if now - _gas_price_cache[0] > _GAS_PRICE_TTL:
+        _gas_price_cache = (now, _w3.eth.gas_price)
+    return _gas_price_cache[1]
+
 
 def init_blockchain():
     """Initialize web3 connection and contract instance."""
-    global _w3, _contract, _account
+    global _w3, _contract, _account, _nonce, _supports_batch
 
     if not _HAS_WEB3:
         logger.warning("web3 not available — blockchain calls will be stubbed")
@@ -49,6 +76,13 @@ def init_blockchain():
     _account = _w3.eth.account.from_key(private_key)
     logger.info(f"Blockchain wallet: {_account.address}")
 
+    try:
+        _nonce = _w3.eth.get_transaction_count(_account.address, "pending")
+        logger.info(f"Wallet nonce synced: {_nonce}")
+    except Exception as e:
+        logger.warning(f"Could not prefetch wallet nonce: {e}")
+        _nonce = None
+
     # Load contract ABI and address
     artifacts_dir = Path(__file__).parent.parent / "contract_artifacts"
     abi_path = artifacts_dir / "ShipmentAnchor.json"
@@ -66,7 +100,61 @@ def init_blockchain():
 
     contract_address = _w3.to_checksum_address(addr_data["address"])
     _contract = _w3.eth.contract(address=contract_address, abi=abi_data["abi"])
-    logger.info(f"ShipmentAnchor contract loaded at {contract_address}")
+    _supports_batch = any(
+        entry.get("name") == "appendCheckpointBatch" for entry in abi_data["abi"]
+    )
+    logger.info(
+        f"ShipmentAnchor contract loaded at {contract_address} "
+        f"(batch={'yes' if _supports_batch else 'no'})"
+    )
+
+
+# Checkpoint coalescing: bursty scans (a truck unloading a dock) pay the
+# 21k base gas per transaction if each checkpoint goes out alone. When the
+# deployed contract exposes appendCheckpointBatch, enqueued checkpoints
+# are held for up to _BATCH_WINDOW seconds (or _BATCH_MAX items) and sent
+# as one transaction; each caller's future resolves with the shared
+# receipt. Old deployments without the batch method keep single sends.
+_BATCH_WINDOW = 0.5
+_BATCH_MAX = 32
+_supports_batch = False
+_batch_queue: asyncio.Queue | None = None
+_batch_worker: asyncio.Task | None = None
+
+
+def _pad32(document_hash: bytes) -> bytes:
+    # Callers hash with SHA-256 so this is normally a no-op; pad rather
+    # than assert so a short hash cannot crash the checkpoint flow
+    if len(document_hash) < 32:
+        document_hash = document_hash + b'\x00' * (32 - len(document_hash))
+    return document_hash[:32]
+
+
+async def _take_nonce() -> int:
+    global _nonce
+    async with _nonce_lock:
+        if _nonce is None:
+            _nonce = await asyncio.to_thread(
+                _w3.eth.get_transaction_count, _account.address, "pending"
+            )
+        nonce = _nonce
+        _nonce += 1
+    return nonce
+
+
+async def _poll_receipt(tx_hash):
+    """Wait for a receipt without blocking the loop (250 ms polls, 30 s cap)."""
+    deadline = time.monotonic() + 30.0
+    while True:
+        try:
+            receipt = await asyncio.to_thread(_w3.eth.get_transaction_receipt, tx_hash)
+        except Exception:
+            receipt = None  # not yet mined
+        if receipt is not None:
+            return receipt
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"No receipt for {tx_hash.hex()} within 30s")
+        await asyncio.sleep(0.25)
 
 
 async def append_checkpoint(
@@ -87,29 +175,41 @@ async def append_checkpoint(
             "status": "stubbed",
         }
 
+    if _supports_batch:
+        return await _enqueue_checkpoint(shipment_id, location_code, weight_kg, document_hash)
+    return await _send_single(shipment_id, location_code, weight_kg, document_hash)
+
+
+async def _send_single(
+    shipment_id: str,
+    location_code: str,
+    weight_kg: int,
+    document_hash: bytes,
+) -> dict:
+    global _nonce
     try:
-        nonce = _w3.eth.get_transaction_count(_account.address)
-
-        # Pad document_hash to 32 bytes
-        if len(document_hash) < 32:
-            document_hash = document_hash + b'\x00' * (32 - len(document_hash))
-        doc_hash_bytes32 = document_hash[:32]
-
-        tx = _contract.functions.appendCheckpoint(
-            shipment_id,
-            location_code,
-            weight_kg,
-            doc_hash_bytes32,
-        ).build_transaction({
-            "from": _account.address,
-            "nonce": nonce,
-            "gas": 300000,
-            "gasPrice": _w3.eth.gas_price,
-        })
-
-        signed_tx = _w3.eth.account.sign_transaction(tx, _account.key)
-        tx_hash = _w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        receipt = _w3.eth.wait_for_transaction_receipt(tx_hash, timeout=30)
+        nonce = await _take_nonce()
+        doc_hash_bytes32 = _pad32(document_hash)
+
+        # Build/sign/send are blocking HTTP + signing work — run them in one
+        # thread hop so the event loop keeps serving other requests
+        def _build_sign_send():
+            tx = _contract.functions.appendCheckpoint(
+                shipment_id,
+                location_code,
+                weight_kg,
+                doc_hash_bytes32,
+            ).build_transaction({
+                "from": _account.address,
+                "nonce": nonce,
+                "gas": 300000,
+                "gasPrice": _get_gas_price(),
+            })
+            signed_tx = _w3.eth.account.sign_transaction(tx, _account.key)
+            return _w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+
+        tx_hash = await asyncio.to_thread(_build_sign_send)
+        receipt = await _poll_receipt(tx_hash)
 
         return {
             "tx_hash": receipt.transactionHash.hex(),
@@ -118,6 +218,9 @@ async def append_checkpoint(
         }
     except Exception as e:
         logger.error(f"Blockchain tx error: {e}")
+        # The local counter may now be ahead of (or behind) the chain —
+        # drop it and resync from the node before the next send
+        _nonce = None
         return {
             "tx_hash": None,
             "block_number": None,
@@ -126,6 +229,88 @@ async def append_checkpoint(
         }
 
 
+async def _enqueue_checkpoint(
+    shipment_id: str,
+    location_code: str,
+    weight_kg: int,
+    document_hash: bytes,
+) -> dict:
+    global _batch_queue, _batch_worker
+    if _batch_queue is None:
+        _batch_queue = asyncio.Queue()
+    if _batch_worker is None or _batch_worker.done():
+        _batch_worker = asyncio.create_task(_batch_loop())
+
+    future: asyncio.Future = asyncio.get_running_loop().create_future()
+    _batch_queue.put_nowait((shipment_id, location_code, weight_kg, document_hash, future))
+    return await future
+
+
+async def _batch_loop():
+    while True:
+        items = [await _batch_queue.get()]
+        deadline = time.monotonic() + _BATCH_WINDOW
+        while len(items) < _BATCH_MAX:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(_batch_queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        await _flush_batch(items)
+
+
+async def _flush_batch(items: list[tuple]) -> None:
+    global _nonce
+    futures = [item[4] for item in items]
+    try:
+        nonce = await _take_nonce()
+        shipment_ids = [item[0] for item in items]
+        location_codes = [item[1] for item in items]
+        weights = [item[2] for item in items]
+        hashes = [_pad32(item[3]) for item in items]
+
+        def _build_sign_send():
+            tx = _contract.functions.appendCheckpointBatch(
+                shipment_ids,
+                location_codes,
+                weights,
+                hashes,
+            ).build_transaction({
+                "from": _account.address,
+                "nonce": nonce,
+                # Per-checkpoint budget plus one base allowance for the tx
+                "gas": 100000 + 200000 * len(items),
+                "gasPrice": _get_gas_price(),
+            })
+            signed_tx = _w3.eth.account.sign_transaction(tx, _account.key)
+            return _w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+
+        tx_hash = await asyncio.to_thread(_build_sign_send)
+        receipt = await _poll_receipt(tx_hash)
+        result = {
+            "tx_hash": receipt.transactionHash.hex(),
+            "block_number": receipt.blockNumber,
+            "status": "confirmed" if receipt.status == 1 else "failed",
+            "batch_size": len(items),
+        }
+        for future in futures:
+            if not future.done():
+                future.set_result(dict(result))
+    except Exception as e:
+        logger.error(f"Blockchain batch tx error ({len(items)} checkpoints): {e}")
+        _nonce = None
+        for future in futures:
+            if not future.done():
+                future.set_result({
+                    "tx_hash": None,
+                    "block_number": None,
+                    "status": "error",
+                    "error": str(e),
+                })
+
+
 async def get_checkpoints(shipment_id: str) -> list[dict]:
     """Retrieve all checkpoints for a shipment from the blockchain."""
     if _contract is None or _w3 is None:
@@ -5,7 +5,7 @@ When a delay is detected at a node, all downstream ETAs are shifted by the delta
 This runs entirely off-chain.
 """
 
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 
 
 def propagate_delay(
@@ -16,6 +16,11 @@ def propagate_delay(
     """
     Shift ETAs for all remaining nodes after node_index by delay_hours.
 
+    Nodes carrying expected_arrival_epoch take a numeric fast path: the
+    shift is a float addition and the ISO mirror is re-rendered from the
+    epoch, skipping the fromisoformat parse. Legacy nodes fall back to
+    parsing the ISO string.
+
     Args:
         route: list of route node dicts with 'eta' keys (ISO format strings or None)
         node_index: index of the node where delay was detected
@@ -25,19 +30,24 @@ def propagate_delay(
         Updated route with shifted ETAs
     """
     delta = timedelta(hours=delay_hours)
+    delta_secs = delta.total_seconds()
 
     for i in range(node_index + 1, len(route)):
         node = route[i]
-        if node.get("eta"):
-            # Parse ISO format, add delta, write back
-            from datetime import datetime
+        eta_str = node.get("eta")
+        if eta_str:
             try:
-                eta = datetime.fromisoformat(node["eta"])
-                node["eta"] = (eta + delta).isoformat()
+                node["eta"] = (datetime.fromisoformat(eta_str) + delta).isoformat()
             except (ValueError, TypeError):
                 pass  # skip nodes with bad ETA data
-        if node.get("expected_arrival"):
-            from datetime import datetime
+        epoch = node.get("expected_arrival_epoch")
+        if epoch is not None:
+            new_epoch = epoch + delta_secs
+            node["expected_arrival_epoch"] = new_epoch
+            node["expected_arrival"] = datetime.fromtimestamp(
+                new_epoch, timezone.utc
+            ).isoformat()
+        elif node.get("expected_arrival"):
             try:
                 ea = datetime.fromisoformat(node["expected_arrival"])
                 node["expected_arrival"] = (ea + delta).isoformat()
@@ -5,9 +5,11 @@ Provides CRUD operations for shipments, telemetry, and anomalies collections.
 Falls back to in-memory storage if Firebase credentials are not available.
 """
 
+import asyncio
 import os
 import logging
-from datetime import datetime
+import time
+from datetime import timedelta
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +34,12 @@ _mem_store: dict[str, dict[str, dict]] = {
     "storage": {},  # For local dev PDF bytes
 }
 
+# Secondary indexes over the in-memory users store (email / firebase_uid
+# → user_id), so the fallback lookups are O(1) like their Firestore
+# counterparts instead of scanning every user per auth
+_mem_users_by_email: dict[str, str] = {}
+_mem_users_by_firebase_uid: dict[str, str] = {}
+
 
 def init_firebase():
     """Initialize Firebase Admin SDK."""
@@ -82,6 +90,42 @@ async def upload_pdf(file_bytes: bytes, destination_path: str, content_type: str
         return ""
 
 
+async def upload_pdf_stream(
+    stream,
+    destination_path: str,
+    content_type: str = "application/pdf",
+    size_hint: int | None = None,
+) -> str:
+    """Upload a PDF from a binary file object without buffering it in RAM.
+
+    Streams in 256 KiB chunks off the event loop — callers holding a
+    SpooledTemporaryFile from an UploadFile can pass it straight through
+    with no full-file copy. Returns a week-long signed URL (generated
+    locally from the service account, no extra RPC) instead of flipping
+    the blob public.
+    """
+    if not _db:
+        # In-memory mock
+        stream.seek(0)
+        _mem_store["storage"][destination_path] = stream.read()
+        return f"mock-url://{destination_path}"
+
+    try:
+        bucket = storage.bucket()
+        blob = bucket.blob(destination_path)
+        blob.chunk_size = 256 * 1024
+
+        def _upload() -> str:
+            stream.seek(0)
+            blob.upload_from_file(stream, content_type=content_type, size=size_hint)
+            return blob.generate_signed_url(expiration=timedelta(days=7))
+
+        return await asyncio.to_thread(_upload)
+    except Exception as e:
+        logger.error(f"Storage stream upload error for {destination_path}: {e}")
+        return ""
+
+
 async def download_pdf(destination_path: str) -> bytes | None:
     """Download PDF bytes from Firebase Storage."""
     if not _db:
@@ -99,15 +143,31 @@ async def download_pdf(destination_path: str) -> bytes | None:
         return None
 
 
+def iso_utc_now() -> str:
+    """Current UTC time as an ISO-8601 string, e.g. 2026-08-28T17:45:00.123456Z.
+
+    Formats straight from time.time_ns() with one %-format instead of
+    constructing a tz-aware datetime and walking isoformat() — the stamp
+    runs on every document write, so the shortcut adds up under load.
+    """
+    s, ns = divmod(time.time_ns(), 1_000_000_000)
+    t = time.gmtime(s)
+    return "%04d-%02d-%02dT%02d:%02d:%02d.%06dZ" % (
+        t.tm_year, t.tm_mon, t.tm_mday,
+        t.tm_hour, t.tm_min, t.tm_sec, ns // 1000,
+    )
+
+
 # ─── Shipments ────────────────────────────────────────────
 
 async def create_shipment(shipment_id: str, data: dict) -> dict:
     """Create or overwrite a shipment document."""
-    data["created_at"] = datetime.utcnow().isoformat()
+    data["created_at"] = iso_utc_now()
     if _db:
         _db.collection("shipments").document(shipment_id).set(data)
     else:
         _mem_store["shipments"][shipment_id] = data
+    _shipment_cache.pop(shipment_id, None)
     return data
 
 
@@ -119,16 +179,95 @@ async def get_shipment(shipment_id: str) -> dict | None:
     return _mem_store["shipments"].get(shipment_id)
 
 
-async def list_shipments() -> list[dict]:
-    """List all shipments."""
+async def list_shipments(
+    fields: list[str] | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> list[dict]:
+    """List all shipments.
+
+    Optionally projects to `fields` and paginates by created_at: pass the
+    last created_at of the previous page as `cursor`. Defaults keep the
+    full-collection behavior for existing callers.
+    """
+    if _db:
+        query = _db.collection("shipments")
+        if fields:
+            query = query.select(fields)
+        if limit or cursor:
+            query = query.order_by("created_at")
+            if cursor:
+                query = query.start_after({"created_at": cursor})
+            if limit:
+                query = query.limit(limit)
+        docs = query.stream()
+        return [doc.to_dict() for doc in docs]
+
+    shipments = list(_mem_store["shipments"].values())
+    if limit or cursor:
+        shipments.sort(key=lambda s: s.get("created_at", ""))
+        if cursor:
+            shipments = [s for s in shipments if s.get("created_at", "") > cursor]
+        if limit:
+            shipments = shipments[:limit]
+    if fields:
+        shipments = [{f: s.get(f) for f in fields if f in s} for s in shipments]
+    return shipments
+
+
+# Hot-path shipment cache for the checkpoint flow. There is no Redis in
+# this deployment, so it is an in-process TTL cache; every write path
+# (create/update) drops the key, which keeps single-worker reads coherent.
+_SHIPMENT_CACHE_TTL = 60.0
+_shipment_cache: dict[str, tuple[float, dict | None]] = {}
+
+
+async def get_shipment_cached(shipment_id: str) -> dict | None:
+    """Retrieve a shipment, serving repeat reads from a short-lived cache."""
+    cached = _shipment_cache.get(shipment_id)
+    if cached and time.monotonic() - cached[0] < _SHIPMENT_CACHE_TTL:
+        return cached[1]
+    shipment = await get_shipment(shipment_id)
+    _shipment_cache[shipment_id] = (time.monotonic(), shipment)
+    return shipment
+
+
+async def list_shipments_for_user(user_id: str, role: str) -> list[dict]:
+    """List shipments where the user is the manufacturer or receiver.
+
+    Uses an indexed equality query instead of scanning all shipments.
+    """
+    field = f"{role}_id"
     if _db:
-        docs = _db.collection("shipments").stream()
+        docs = _db.collection("shipments").where(field, "==", user_id).stream()
         return [doc.to_dict() for doc in docs]
-    return list(_mem_store["shipments"].values())
+    return [
+        s for s in _mem_store["shipments"].values()
+        if s.get(field) == user_id
+    ]
+
+
+async def get_shipments_bulk(shipment_ids: list[str]) -> list[dict]:
+    """Fetch several shipments in one RPC via get_all instead of N gets.
+
+    Missing ids are skipped; order follows what the server returns.
+    """
+    if not shipment_ids:
+        return []
+    if _db:
+        refs = [_db.collection("shipments").document(sid) for sid in shipment_ids]
+        docs = await asyncio.to_thread(lambda: list(_db.get_all(refs)))
+        return [doc.to_dict() for doc in docs if doc.exists]
+    return [
+        _mem_store["shipments"][sid]
+        for sid in shipment_ids
+        if sid in _mem_store["shipments"]
+    ]
 
 
 async def update_shipment(shipment_id: str, updates: dict) -> dict | None:
     """Partially update a shipment."""
+    _shipment_cache.pop(shipment_id, None)
     if _db:
         ref = _db.collection("shipments").document(shipment_id)
         ref.update(updates)
@@ -140,13 +279,48 @@ async def update_shipment(shipment_id: str, updates: dict) -> dict | None:
     return None
 
 
+async def commit_batch(ops: list[tuple[str, str, str, dict]]) -> None:
+    """Apply several document writes in one Firestore batch commit.
+
+    Each op is (action, collection, doc_id, data) with action "set" or
+    "update". A WriteBatch collapses N sequential round trips into a single
+    RPC and commits atomically; the in-memory store applies the ops in order.
+    """
+    for _, collection, doc_id, _data in ops:
+        if collection == "shipments":
+            _shipment_cache.pop(doc_id, None)
+
+    if _db:
+        batch = _db.batch()
+        for action, collection, doc_id, data in ops:
+            ref = _db.collection(collection).document(doc_id)
+            if action == "update":
+                batch.update(ref, data)
+            else:
+                batch.set(ref, data)
+        await asyncio.to_thread(batch.commit)
+        return
+
+    for action, collection, doc_id, data in ops:
+        store = _mem_store[collection]
+        if action == "update" and doc_id in store:
+            store[doc_id].update(data)
+        else:
+            store[doc_id] = data
+
+
 # ─── Telemetry ────────────────────────────────────────────
 
+def telemetry_doc_id(shipment_id: str, location_code: str, recorded_at: str) -> str:
+    """Deterministic telemetry document ID (shared with batched writers)."""
+    return f"{shipment_id}_{location_code}_{recorded_at}"
+
+
 async def add_telemetry(shipment_id: str, data: dict) -> dict:
     """Store a telemetry record."""
     data["shipment_id"] = shipment_id
-    data["recorded_at"] = datetime.utcnow().isoformat()
-    doc_id = f"{shipment_id}_{data.get('location_code', 'unknown')}_{data['recorded_at']}"
+    data["recorded_at"] = iso_utc_now()
+    doc_id = telemetry_doc_id(shipment_id, data.get("location_code", "unknown"), data["recorded_at"])
 
     if _db:
         _db.collection("telemetry").document(doc_id).set(data)
@@ -168,11 +342,49 @@ async def get_telemetry(shipment_id: str) -> list[dict]:
     ]
 
 
+# The first telemetry record (baseline weight) is immutable once written,
+# so repeated God-Mode calls within a session can reuse it briefly
+_FIRST_TELEMETRY_TTL = 30.0
+_first_telemetry_cache: dict[str, tuple[float, dict | None]] = {}
+
+
+async def get_first_telemetry(shipment_id: str) -> dict | None:
+    """Get the first (baseline) telemetry record for a shipment.
+
+    Fetches one document via order_by + limit instead of streaming the
+    whole telemetry list just to read index 0.
+    """
+    now = time.monotonic()
+    cached = _first_telemetry_cache.get(shipment_id)
+    if cached and now - cached[0] < _FIRST_TELEMETRY_TTL:
+        return cached[1]
+
+    if _db:
+        docs = _db.collection("telemetry").where(
+            "shipment_id", "==", shipment_id
+        ).order_by("timestamp").limit(1).stream()
+        record = next((doc.to_dict() for doc in docs), None)
+    else:
+        records = [
+            v for v in _mem_store["telemetry"].values()
+            if v.get("shipment_id") == shipment_id
+        ]
+        record = min(records, key=lambda r: r.get("timestamp") or "") if records else None
+
+    # Cache hits only: the baseline is immutable once written, but a cached
+    # None goes stale the moment the first telemetry lands — and nothing
+    # invalidates this cache on telemetry writes, so a checkpoint arriving
+    # within the TTL would see no baseline at all
+    if record is not None:
+        _first_telemetry_cache[shipment_id] = (now, record)
+    return record
+
+
 # ─── Anomalies ────────────────────────────────────────────
 
 async def add_anomaly(data: dict) -> dict:
     """Store an anomaly record."""
-    data["created_at"] = data.get("created_at", datetime.utcnow().isoformat())
+    data["created_at"] = data.get("created_at", iso_utc_now())
     doc_id = f"{data['shipment_id']}_{data['anomaly_type']}_{data['created_at']}"
 
     if _db:
@@ -195,24 +407,92 @@ async def get_anomalies(shipment_id: str) -> list[dict]:
     ]
 
 
-async def get_all_anomalies() -> list[dict]:
-    """Get all anomalies across all shipments."""
+async def get_anomalies_for_shipments(shipment_ids: list[str]) -> list[dict]:
+    """Get anomalies for a set of shipments via indexed `in` queries.
+
+    Firestore caps `in` filters at 10 values, so the ids are chunked and
+    the batches fetched concurrently.
+    """
+    if not shipment_ids:
+        return []
+
     if _db:
-        docs = _db.collection("anomalies").stream()
+        def _fetch(batch: list[str]) -> list[dict]:
+            docs = _db.collection("anomalies").where(
+                "shipment_id", "in", batch
+            ).stream()
+            return [doc.to_dict() for doc in docs]
+
+        batches = [shipment_ids[i:i + 10] for i in range(0, len(shipment_ids), 10)]
+        results = await asyncio.gather(*[
+            asyncio.to_thread(_fetch, batch) for batch in batches
+        ])
+        return [a for chunk in results for a in chunk]
+
+    wanted = set(shipment_ids)
+    return [
+        v for v in _mem_store["anomalies"].values()
+        if v.get("shipment_id") in wanted
+    ]
+
+
+async def get_all_anomalies(
+    fields: list[str] | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> list[dict]:
+    """Get all anomalies across all shipments.
+
+    Same projection/pagination knobs as list_shipments, cursoring on
+    created_at; defaults preserve the full-collection behavior.
+    """
+    if _db:
+        query = _db.collection("anomalies")
+        if fields:
+            query = query.select(fields)
+        if limit or cursor:
+            query = query.order_by("created_at")
+            if cursor:
+                query = query.start_after({"created_at": cursor})
+            if limit:
+                query = query.limit(limit)
+        docs = query.stream()
         return [doc.to_dict() for doc in docs]
-    return list(_mem_store["anomalies"].values())
+
+    anomalies = list(_mem_store["anomalies"].values())
+    if limit or cursor:
+        anomalies.sort(key=lambda a: a.get("created_at", ""))
+        if cursor:
+            anomalies = [a for a in anomalies if a.get("created_at", "") > cursor]
+        if limit:
+            anomalies = anomalies[:limit]
+    if fields:
+        anomalies = [{f: a.get(f) for f in fields if f in a} for a in anomalies]
+    return anomalies
 
 
 async def resolve_anomaly(shipment_id: str, anomaly_type: str) -> bool:
-    """Mark anomalies of a given type for a shipment as resolved."""
+    """Mark anomalies of a given type for a shipment as resolved.
+
+    The matched docs are patched through one WriteBatch commit instead of
+    one update RPC per document.
+    """
     if _db:
-        docs = _db.collection("anomalies").where(
-            "shipment_id", "==", shipment_id
-        ).where(
-            "anomaly_type", "==", anomaly_type
-        ).stream()
-        for doc in docs:
-            doc.reference.update({"resolved": True})
+        def _resolve() -> None:
+            docs = _db.collection("anomalies").where(
+                "shipment_id", "==", shipment_id
+            ).where(
+                "anomaly_type", "==", anomaly_type
+            ).stream()
+            batch = _db.batch()
+            count = 0
+            for doc in docs:
+                batch.update(doc.reference, {"resolved": True})
+                count += 1
+            if count:
+                batch.commit()
+
+        await asyncio.to_thread(_resolve)
         return True
     else:
         for v in _mem_store["anomalies"].values():
@@ -223,53 +503,148 @@ async def resolve_anomaly(shipment_id: str, anomaly_type: str) -> bool:
 
 # ─── Users ────────────────────────────────────────────────
 
+# User-lookup cache: every authenticated request resolves a user profile
+# by firebase_uid (sometimes email), and profiles change rarely. Same
+# in-process TTL-dict shape as the shipment cache; positive hits only,
+# so a missing profile is always re-queried.
+_USER_CACHE_TTL = 60.0
+_USER_CACHE_MAX = 10_000
+_user_cache: dict[tuple[str, str], tuple[float, dict]] = {}
+
+
+def _user_cache_get(key: tuple[str, str]) -> dict | None:
+    cached = _user_cache.get(key)
+    if cached and time.monotonic() - cached[0] < _USER_CACHE_TTL:
+        return cached[1]
+    return None
+
+
+def _user_cache_put(key: tuple[str, str], user: dict) -> None:
+    if len(_user_cache) >= _USER_CACHE_MAX:
+        _user_cache.clear()
+    _user_cache[key] = (time.monotonic(), user)
+
+
+def _user_cache_invalidate(user: dict) -> None:
+    for key in (
+        ("id", user.get("user_id", "")),
+        ("email", user.get("email", "")),
+        ("uid", user.get("firebase_uid", "")),
+    ):
+        _user_cache.pop(key, None)
+
+
 async def create_user(user_id: str, data: dict) -> dict:
     """Create a user document."""
     if _db:
         _db.collection("users").document(user_id).set(data)
     else:
         _mem_store["users"][user_id] = data
+        if data.get("email"):
+            _mem_users_by_email[data["email"]] = user_id
+        if data.get("firebase_uid"):
+            _mem_users_by_firebase_uid[data["firebase_uid"]] = user_id
+    _user_cache_invalidate(data)
     return data
 
 
 async def get_user(user_id: str) -> dict | None:
     """Retrieve a user by ID."""
+    cached = _user_cache_get(("id", user_id))
+    if cached is not None:
+        return cached
     if _db:
         doc = _db.collection("users").document(user_id).get()
-        return doc.to_dict() if doc.exists else None
-    return _mem_store["users"].get(user_id)
+        user = doc.to_dict() if doc.exists else None
+    else:
+        user = _mem_store["users"].get(user_id)
+    if user:
+        _user_cache_put(("id", user_id), user)
+    return user
 
 
 async def get_user_by_email(email: str) -> dict | None:
     """Find a user by email."""
+    cached = _user_cache_get(("email", email))
+    if cached is not None:
+        return cached
+    user = None
     if _db:
         docs = _db.collection("users").where("email", "==", email).limit(1).stream()
         for doc in docs:
-            return doc.to_dict()
-        return None
-    for u in _mem_store["users"].values():
-        if u.get("email") == email:
-            return u
-    return None
+            user = doc.to_dict()
+            break
+    else:
+        uid = _mem_users_by_email.get(email)
+        user = _mem_store["users"].get(uid) if uid else None
+        if user is None:
+            # Entries written around create_user (seed scripts) miss the index
+            for u in _mem_store["users"].values():
+                if u.get("email") == email:
+                    user = u
+                    break
+    if user:
+        _user_cache_put(("email", email), user)
+    return user
 
 
 async def get_user_by_firebase_uid(firebase_uid: str) -> dict | None:
     """Find a user by Firebase UID."""
+    cached = _user_cache_get(("uid", firebase_uid))
+    if cached is not None:
+        return cached
+    user = None
     if _db:
         docs = _db.collection("users").where("firebase_uid", "==", firebase_uid).limit(1).stream()
         for doc in docs:
-            return doc.to_dict()
-        return None
-    for u in _mem_store["users"].values():
-        if u.get("firebase_uid") == firebase_uid:
-            return u
-    return None
-
-
-async def list_users_by_role(role: str) -> list[dict]:
-    """List all users with a specific role."""
+            user = doc.to_dict()
+            break
+    else:
+        uid = _mem_users_by_firebase_uid.get(firebase_uid)
+        user = _mem_store["users"].get(uid) if uid else None
+        if user is None:
+            # Entries written around create_user (seed scripts) miss the index
+            for u in _mem_store["users"].values():
+                if u.get("firebase_uid") == firebase_uid:
+                    user = u
+                    break
+    if user:
+        _user_cache_put(("uid", firebase_uid), user)
+    return user
+
+
+async def list_users_by_role(
+    role: str,
+    fields: list[str] | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> list[dict]:
+    """List users with a specific role.
+
+    Optionally projects to `fields` (fewer wire bytes per document) and
+    paginates by user_id: pass the last user_id of the previous page as
+    `cursor` to fetch the next `limit` documents.
+    """
     if _db:
-        docs = _db.collection("users").where("role", "==", role).stream()
-        return [doc.to_dict() for doc in docs]
-    return [u for u in _mem_store["users"].values() if u.get("role") == role]
+        query = _db.collection("users").where("role", "==", role)
+        if fields:
+            query = query.select(fields)
+        if cursor is not None or limit is not None:
+            query = query.order_by("user_id")
+        if cursor is not None:
+            query = query.start_after({"user_id": cursor})
+        if limit is not None:
+            query = query.limit(limit)
+        return [doc.to_dict() for doc in query.stream()]
+
+    users = [u for u in _mem_store["users"].values() if u.get("role") == role]
+    if cursor is not None or limit is not None:
+        users.sort(key=lambda u: u.get("user_id", ""))
+        if cursor is not None:
+            users = [u for u in users if u.get("user_id", "") > cursor]
+        if limit is not None:
+            users = users[:limit]
+    if fields:
+        users = [{k: u.get(k) for k in fields} for u in users]
+    return users
 
@@ -4,22 +4,73 @@ GenAI Service — Groq integration for:
 2. Anomaly interpretation
 """
 
-import json
+import asyncio
+import hashlib
+import io
 import os
 import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import orjson
 
 logger = logging.getLogger(__name__)
 
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI
     _HAS_GENAI = True
 except ImportError:
     _HAS_GENAI = False
     logger.warning("openai not installed — using stub responses")
 
 
+# Cap concurrent LLM round-trips: the provider enforces a per-minute token
+# budget, and a burst of parallel requests turns into 429 retries that
+# dominate tail latency. A bounded semaphore queues excess calls instead.
+_GENAI_SEM = asyncio.Semaphore(10)
+
+# Circuit breaker: after _BREAKER_THRESHOLD consecutive failures the
+# provider is assumed down and calls short-circuit to the stub for
+# _BREAKER_RESET seconds instead of each paying a full timeout. Retries
+# within a call are the SDK's job (max_retries with built-in jitter);
+# this guards across calls.
+_BREAKER_THRESHOLD = 5
+_BREAKER_RESET = 30.0
+_consecutive_failures = 0
+_breaker_open_until = 0.0
+
+
+def _breaker_open() -> bool:
+    return time.monotonic() < _breaker_open_until
+
+
+def _record_success() -> None:
+    global _consecutive_failures
+    _consecutive_failures = 0
+
+
+def _record_failure() -> None:
+    global _consecutive_failures, _breaker_open_until
+    _consecutive_failures += 1
+    if _consecutive_failures >= _BREAKER_THRESHOLD:
+        _breaker_open_until = time.monotonic() + _BREAKER_RESET
+        _consecutive_failures = 0
+        logger.warning(
+            f"GenAI breaker open — serving stubs for {_BREAKER_RESET:.0f}s "
+            f"after {_BREAKER_THRESHOLD} consecutive failures"
+        )
+
+
+@lru_cache(maxsize=1)
 def _get_client():
-    """Create Groq client via OpenAI SDK. Currently disabled — using stub responses."""
+    """Groq client via the async OpenAI SDK. Currently disabled — using stub responses.
+
+    Memoized so the client — and with it the SDK's httpx connection pool,
+    TLS session, and auth headers — is built once per process instead of
+    per call. On key rotation, call _get_client.cache_clear().
+    """
     return None  # Temporarily disabled to prevent blocking
     # if not _HAS_GENAI:
     #     return None
@@ -27,56 +78,95 @@ def _get_client():
     # if not api_key:
     #     logger.warning("GROQ_API_KEY not set — using stub responses")
     #     return None
-    # 
-    # return OpenAI(
+    #
+    # return AsyncOpenAI(
     #     base_url="https://api.groq.com/openai/v1",
-    #     api_key=api_key
+    #     api_key=api_key,
+    #     max_retries=2,
     # )
 
 
+# Compiled once — _parse_json_response runs per LLM call
+_THINK_RE = re.compile(r'<think>.*?</think>', re.DOTALL)  # Qwen3-style reasoning blocks
+_FENCE_RE = re.compile(r'^[ \t]*```.*$\n?', re.MULTILINE)  # markdown code fences
+
+
 def _parse_json_response(text: str) -> dict:
     """Extract JSON from response (handles markdown code fences and <think> tags)."""
-    import re
-    cleaned = text.strip()
-    # Strip Qwen3-style <think>...</think> reasoning blocks
-    cleaned = re.sub(r'<think>.*?</think>', '', cleaned, flags=re.DOTALL).strip()
-    # Remove markdown code fences
+    cleaned = _THINK_RE.sub('', text.strip()).strip()
     if cleaned.startswith("```"):
-        lines = cleaned.split("\n")
-        lines = [l for l in lines if not l.strip().startswith("```")]
-        cleaned = "\n".join(lines)
+        cleaned = _FENCE_RE.sub('', cleaned)
     try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
+        return orjson.loads(cleaned)
+    except orjson.JSONDecodeError:
         # Try to find JSON object in the text
         match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', cleaned, re.DOTALL)
         if match:
             try:
-                return json.loads(match.group())
-            except json.JSONDecodeError:
+                return orjson.loads(match.group())
+            except orjson.JSONDecodeError:
                 pass
         logger.error(f"Failed to parse JSON from GenAI response: {text[:500]}")
         return {"raw_response": text, "parse_error": True}
 
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> str:
-    """Extract all text from a binary PDF stream using pdfplumber."""
+try:
+    import pypdfium2 as pdfium
+    _HAS_PDFIUM = True
+except ImportError:
+    _HAS_PDFIUM = False
+    logger.warning("pypdfium2 not installed — falling back to pdfplumber for PDF text")
+
+# Page pool for the pdfplumber fallback: pdfminer's layout analysis is
+# per-page CPU work that releases no lock between pages, so multi-page
+# BOLs extract near-linearly across cores. PDFium is NOT thread-safe,
+# so its (already fast) path stays sequential.
+_PAGE_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 4)
+
+
+def extract_text_from_pdf(pdf_source) -> str:
+    """Extract all text from a PDF (bytes or a binary file object).
+
+    Uses PDFium when available — we only need plain text here, and its
+    native glyph-to-text is several times faster than pdfminer's full
+    layout analysis. pdfplumber stays as the fallback backend.
+    """
+    if isinstance(pdf_source, (bytes, bytearray)):
+        pdf_source = io.BytesIO(pdf_source)
+
+    if _HAS_PDFIUM:
+        try:
+            pdf = pdfium.PdfDocument(pdf_source)
+            try:
+                pages_text = [page.get_textpage().get_text_range() for page in pdf]
+            finally:
+                pdf.close()
+            return "\n".join(t for t in pages_text if t).strip()
+        except Exception as e:
+            logger.error(f"PDFium extraction error, retrying with pdfplumber: {e}")
+            if hasattr(pdf_source, "seek"):
+                pdf_source.seek(0)
+
     import pdfplumber
-    import io
-    
-    text = ""
+
     try:
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-            for page in pdf.pages:
-                extracted = page.extract_text()
-                if extracted:
-                    text += extracted + "\n"
-        return text.strip()
+        with pdfplumber.open(pdf_source) as pdf:
+            texts = list(_PAGE_POOL.map(lambda p: p.extract_text(), pdf.pages))
+        return "\n".join(t for t in texts if t).strip()
     except Exception as e:
         logger.error(f"PDF extraction error: {e}")
         return ""
 
 
+async def extract_text_from_pdf_async(pdf_source) -> str:
+    """extract_text_from_pdf off the event loop.
+
+    pdfminer's layout analysis is pure-CPU and can take seconds; async
+    handlers should await this instead of calling the sync version inline.
+    """
+    return await asyncio.to_thread(extract_text_from_pdf, pdf_source)
+
+
 async def classify_shipment(
     po_text: str,
     invoice_text: str,
@@ -88,7 +178,7 @@ async def classify_shipment(
     """
     client = _get_client()
 
-    if client is None:
+    if client is None or _breaker_open():
         return {
             "product_category": "pharmaceutical",
             "risk_flags": ["temperature_sensitive"],
@@ -118,17 +208,18 @@ Respond ONLY with a JSON object in this exact format, no markdown formatting or
 }}"""
 
     try:
-        import asyncio
-        response = await asyncio.to_thread(
-            client.chat.completions.create,
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1
-        )
+        async with _GENAI_SEM:
+            response = await client.chat.completions.create(
+                model="llama-3.3-70b-versatile",
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.1
+            )
+        _record_success()
         return _parse_json_response(response.choices[0].message.content)
     except Exception as e:
+        _record_failure()
         logger.error(f"Groq classification error: {e}")
         return {
             "product_category": "default",
@@ -140,13 +231,46 @@ Respond ONLY with a JSON object in this exact format, no markdown formatting or
         }
 
 
+async def classify_shipments_bulk(
+    document_trios: list[tuple[str, str, str]],
+) -> list[dict]:
+    """
+    Classify many (po_text, invoice_text, bol_text) trios concurrently.
+
+    Backfill jobs call classify_shipment serially and pay N sequential
+    LLM round trips; gathering them lets the calls overlap while
+    _GENAI_SEM keeps the provider's rate limit happy. Results come back
+    in input order.
+    """
+    if not document_trios:
+        return []
+    return list(await asyncio.gather(
+        *(classify_shipment(po, inv, bol) for po, inv, bol in document_trios)
+    ))
+
+
+# Content-hash cache for anomaly interpretations. Identical contexts (same
+# anomaly type / category / location / details) produce identical LLM output,
+# so repeats are served from memory for a day instead of re-paying a
+# multi-second LLM round trip. In-process dict — this deployment has no Redis.
+_INTERP_CACHE_TTL = 86400.0
+_INTERP_CACHE_MAX = 2048
+_interp_cache: dict[str, tuple[float, dict]] = {}
+
+
+def _context_cache_key(anomaly_context: dict) -> str:
+    payload = orjson.dumps(anomaly_context, option=orjson.OPT_SORT_KEYS, default=str)
+    return hashlib.sha256(payload).hexdigest()
+
+
 async def interpret_anomaly(anomaly_context: dict) -> dict:
     """
     Generate a business-context interpretation of a detected anomaly.
+    Identical contexts are served from a content-hash cache.
     """
     client = _get_client()
 
-    if client is None:
+    if client is None or _breaker_open():
         logger.warning("No GenAI client available — returning stub response")
         return {
             "risk_assessment": f"Anomaly {anomaly_context.get('anomaly_type', 'UNKNOWN')} detected — "
@@ -161,7 +285,7 @@ async def interpret_anomaly(anomaly_context: dict) -> dict:
     prompt = f"""You are a supply chain risk analyst. Analyze the following anomaly event and provide a business impact assessment.
 
 Anomaly Context:
-{json.dumps(anomaly_context, indent=2, default=str)}
+{orjson.dumps(anomaly_context, option=orjson.OPT_INDENT_2, default=str).decode()}
 
 Respond ONLY with a JSON object in this exact format, no markdown formatting or extra text:
 {{
@@ -171,17 +295,23 @@ Respond ONLY with a JSON object in this exact format, no markdown formatting or
   "severity_level": "<one of: LOW, MEDIUM, HIGH, CRITICAL>"
 }}"""
 
+    cache_key = _context_cache_key(anomaly_context)
+    cached = _interp_cache.get(cache_key)
+    if cached and time.monotonic() - cached[0] < _INTERP_CACHE_TTL:
+        logger.info(f"[GenAI] Cache hit for {anomaly_context.get('anomaly_type', '?')}")
+        return cached[1]
+
     try:
         logger.info(f"[GenAI] Sending anomaly interpretation request for {anomaly_context.get('anomaly_type', '?')}")
-        import asyncio
-        response = await asyncio.to_thread(
-            client.chat.completions.create,
-            model="alibaba-qwen3-32b",
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1
-        )
+        async with _GENAI_SEM:
+            response = await client.chat.completions.create(
+                model="alibaba-qwen3-32b",
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.1
+            )
+        _record_success()
         raw = response.choices[0].message.content
         logger.info(f"[GenAI] Raw response (first 300 chars): {raw[:300]}")
         parsed = _parse_json_response(raw)
@@ -189,8 +319,13 @@ Respond ONLY with a JSON object in this exact format, no markdown formatting or
             logger.error(f"[GenAI] JSON parse failed, raw: {raw[:500]}")
         else:
             logger.info(f"[GenAI] Successfully parsed assessment: severity={parsed.get('severity_level')}")
+            # Only cache clean parses — failures should be retried
+            if len(_interp_cache) >= _INTERP_CACHE_MAX:
+                _interp_cache.clear()
+            _interp_cache[cache_key] = (time.monotonic(), parsed)
         return parsed
     except Exception as e:
+        _record_failure()
         logger.error(f"[GenAI] Groq anomaly interpretation error: {type(e).__name__}: {e}", exc_info=True)
         return {
             "risk_assessment": "Unable to generate AI assessment.",
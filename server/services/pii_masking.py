@@ -6,6 +6,7 @@ then restores them in the response.
 """
 
 import re
+from functools import lru_cache
 from typing import Any
 
 
@@ -17,6 +18,27 @@ _PII_PATTERNS = [
     (r'\b\d{1,5}\s\w+(?:\s\w+)*\s(?:St|Ave|Blvd|Dr|Rd|Ln|Way|Ct)\b', "ADDRESS"),
 ]
 
+# One alternation over all categories, compiled at import: the text is
+# scanned a single time with the match's named group telling us the
+# category, instead of one full scan (plus str.replace rewrites) per
+# pattern. PIIMasker itself stays a cheap per-request context — it
+# carries the unmask map.
+_UNION_PATTERN: re.Pattern = re.compile(
+    "|".join(f"(?P<{category}>{pattern})" for pattern, category in _PII_PATTERNS)
+)
+
+
+@lru_cache(maxsize=256)
+def _entity_pattern(entities: tuple[str, ...]) -> re.Pattern:
+    """Compiled alternation over a fixed set of extra entities.
+
+    Longest-first so "Acme Corp Ltd" wins over "Acme Corp"; escaped, since
+    vendor names are literals, not regexes. Cached per entity tuple —
+    the same shipment's documents reuse one compilation.
+    """
+    ordered = sorted(entities, key=len, reverse=True)
+    return re.compile("|".join(re.escape(e) for e in ordered))
+
 
 class PIIMasker:
     """Mask PII tokens in text and provide an unmasking map."""
@@ -25,6 +47,10 @@ class PIIMasker:
         self._map: dict[str, str] = {}
         self._reverse_map: dict[str, str] = {}
         self._counter: dict[str, int] = {}
+        # Compiled token alternation for unmasking, rebuilt lazily when
+        # the map has grown since it was last compiled
+        self._unmask_pattern: re.Pattern | None = None
+        self._unmask_pattern_size = 0
 
     def _get_token(self, category: str) -> str:
         count = self._counter.get(category, 0)
@@ -34,37 +60,56 @@ class PIIMasker:
 
     def mask_text(self, text: str, extra_entities: list[str] | None = None) -> str:
         """Replace PII in text with tokens. Also masks any extra_entities provided."""
-        masked = text
+        # Shipments routinely come in with only one of PO/invoice/BOL —
+        # skip the regex machinery entirely for the empty ones
+        if not text:
+            return ""
 
-        # Mask explicitly provided entities first (company names, etc.)
-        if extra_entities:
-            for entity in sorted(extra_entities, key=len, reverse=True):
-                if entity and entity in masked:
-                    token = self._get_token("VENDOR")
-                    self._map[token] = entity
-                    self._reverse_map[entity] = token
-                    masked = masked.replace(entity, token)
+        masked = text
 
-        # Mask regex-detected PII
-        for pattern, category in _PII_PATTERNS:
-            for match in re.finditer(pattern, masked):
+        # Mask explicitly provided entities first (company names, etc.) in
+        # one pass over the text — a cached longest-first alternation
+        # replaces the old per-entity scan-and-replace loop
+        entities = tuple(e for e in extra_entities if e) if extra_entities else ()
+        if entities:
+            def _mask_entity(match: re.Match) -> str:
                 value = match.group()
-                if value.startswith("[") and value.endswith("]"):
-                    continue  # already masked
-                if value not in self._reverse_map:
-                    token = self._get_token(category)
+                token = self._reverse_map.get(value)
+                if token is None:
+                    token = self._get_token("VENDOR")
                     self._map[token] = value
                     self._reverse_map[value] = token
-                masked = masked.replace(value, self._reverse_map.get(value, value))
+                return token
+
+            masked = _entity_pattern(entities).sub(_mask_entity, masked)
 
-        return masked
+        # Mask regex-detected PII in one linear pass: sub() walks the text
+        # once and writes the rewritten string directly, replacing the old
+        # per-pattern rescans and quadratic str.replace rewrites
+        def _mask_match(match: re.Match) -> str:
+            value = match.group()
+            token = self._reverse_map.get(value)
+            if token is None:
+                token = self._get_token(match.lastgroup)
+                self._map[token] = value
+                self._reverse_map[value] = token
+            return token
+
+        return _UNION_PATTERN.sub(_mask_match, masked)
 
     def unmask_text(self, text: str) -> str:
         """Restore all masked tokens back to original values."""
-        result = text
-        for token, original in self._map.items():
-            result = result.replace(token, original)
-        return result
+        # One alternation of the known tokens and one sub() pass, instead
+        # of rescanning the whole string once per mapping entry. Tokens
+        # are bracketed literals, so they need escaping but can't overlap.
+        if not self._map or not text:
+            return text
+        if self._unmask_pattern is None or self._unmask_pattern_size != len(self._map):
+            self._unmask_pattern = re.compile(
+                "|".join(re.escape(token) for token in self._map)
+            )
+            self._unmask_pattern_size = len(self._map)
+        return self._unmask_pattern.sub(lambda m: self._map[m.group()], text)
 
     def unmask_dict(self, data: dict[str, Any]) -> dict[str, Any]:
         """Recursively unmask all string values in a dict."""
@@ -7,7 +7,7 @@ Returns a list of anomalies (empty if all clear).
 
 from config.risk_policies import get_policy
 from models.telemetry_model import AnomalyRecord
-from datetime import datetime
+from datetime import datetime, timezone
 
 
 def evaluate_checkpoint(
@@ -19,14 +19,74 @@ def evaluate_checkpoint(
     weight_kg: float,
     expected_weight_kg: float | None = None,
     delay_hours: float = 0,
+    now: datetime | None = None,
 ) -> list[AnomalyRecord]:
     """
     Evaluate a single checkpoint against deterministic risk policies.
-    Returns empty list if no anomalies.
+    Returns empty list if no anomalies. Tight loops can pass a shared
+    `now` instead of paying a clock read per checkpoint.
     """
-    policy = get_policy(product_category)
+    return _evaluate(
+        policy=get_policy(product_category),
+        now=now if now is not None else datetime.now(timezone.utc),
+        shipment_id=shipment_id,
+        product_category=product_category,
+        location_code=location_code,
+        temperature=temperature,
+        humidity=humidity,
+        weight_kg=weight_kg,
+        expected_weight_kg=expected_weight_kg,
+        delay_hours=delay_hours,
+    )
+
+
+def evaluate_checkpoints_batch(checkpoints: list[dict]) -> list[AnomalyRecord]:
+    """
+    Evaluate many checkpoints in one pass (replay sweeps, God-Mode storms).
+
+    Each dict takes the same keys as evaluate_checkpoint's arguments.
+    Checkpoints are grouped by product category so each policy is resolved
+    once per group, and one timestamp is shared across the whole batch,
+    instead of paying both per checkpoint on the scalar path.
+    """
+    by_category: dict[str, list[dict]] = {}
+    for cp in checkpoints:
+        by_category.setdefault(cp.get("product_category", "default"), []).append(cp)
+
+    now = datetime.now(timezone.utc)
+    anomalies: list[AnomalyRecord] = []
+    for category, group in by_category.items():
+        policy = get_policy(category)
+        for cp in group:
+            anomalies.extend(_evaluate(
+                policy=policy,
+                now=now,
+                shipment_id=cp["shipment_id"],
+                product_category=category,
+                location_code=cp.get("location_code", ""),
+                temperature=cp.get("temperature"),
+                humidity=cp.get("humidity"),
+                weight_kg=cp.get("weight_kg", 0),
+                expected_weight_kg=cp.get("expected_weight_kg"),
+                delay_hours=cp.get("delay_hours", 0),
+            ))
+    return anomalies
+
+
+def _evaluate(
+    policy: dict,
+    now: datetime,
+    shipment_id: str,
+    product_category: str,
+    location_code: str,
+    temperature: float | None,
+    humidity: float | None,
+    weight_kg: float,
+    expected_weight_kg: float | None,
+    delay_hours: float,
+) -> list[AnomalyRecord]:
+    """Policy checks shared by the scalar and batch entry points."""
     anomalies: list[AnomalyRecord] = []
-    now = datetime.utcnow()
 
     # Temperature breach
     if temperature is not None and "temperature_range" in policy: